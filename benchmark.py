@@ -0,0 +1,415 @@
+"""Headless benchmarks for the data and thumbnail hot paths.
+
+    python benchmark.py                          # run everything and print a table
+    python benchmark.py -k thumbnail -k grid     # only benchmarks whose name contains a filter
+    python benchmark.py --save bench.json        # store the results as a baseline
+    python benchmark.py --compare bench.json     # exit 1 if a p50 regressed beyond --tolerance
+
+Everything runs in a temporary directory against a local stand-in server that serves a
+synthetic catalog and generated PNGs, so neither a display nor the network is needed. Each
+benchmark runs in a fresh process, so its peak RSS is its own.
+"""
+import io
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import platform
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image
+
+from data_manager import DataManager, CATALOG_PATH
+from thumbnail_store import THUMBNAIL_SIZE
+from ui.grid_layout import compute_columns, content_height, visible_range, cell_position
+
+CATEGORIES = ("gradient", "pattern", "pureColor", "texture", "landscape")
+IMAGE_SIZE = (480, 320)
+# Distinct generated images; ids share them round-robin
+IMAGE_VARIANTS = 16
+GRID_SIZES = (100, 1000, 10000)
+# Viewport used for the layout benchmarks, in logical pixels
+VIEWPORT = (940, 700)
+SCROLL_STEP = 120
+# Smaller p50 differences are treated as timer noise when comparing
+NOISE_FLOOR_MS = 0.05
+
+
+def make_catalog(items):
+    """{category: {img_id: desc}} with `items` ids spread over CATEGORIES."""
+    catalog = {cat: {} for cat in CATEGORIES}
+    for i in range(items):
+        catalog[CATEGORIES[i % len(CATEGORIES)]][f"bench{i}"] = f"{CATEGORIES[i % len(CATEGORIES)]} 背景 {i}"
+    return catalog
+
+
+def catalog_body(catalog):
+    return json.dumps(catalog, ensure_ascii=False).encode("utf-8")
+
+
+def make_image(seed):
+    rnd = random.Random(seed)
+    start = tuple(rnd.randrange(256) for _ in range(3))
+    end = tuple(rnd.randrange(256) for _ in range(3))
+    mask = Image.linear_gradient("L").rotate(rnd.choice((0, 90, 45))).resize(IMAGE_SIZE)
+    img = Image.composite(Image.new("RGB", IMAGE_SIZE, end), Image.new("RGB", IMAGE_SIZE, start), mask)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class SyntheticServer:
+    """Serves the catalog (with ETag revalidation) and generated images on a free local port."""
+
+    def __init__(self, catalog):
+        self.catalog_body = catalog_body(catalog)
+        self.etag = '"%s"' % hashlib.blake2b(self.catalog_body, digest_size=8).hexdigest()
+        self.images = [make_image(seed) for seed in range(IMAGE_VARIANTS)]
+        image_pattern = re.compile(r"^/images/Background-Color/bench(\d+)-2x\.png$")
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; with Nagle on, keep-alive
+            # requests would stall on delayed ACKs and measure the TCP stack instead
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == CATALOG_PATH:
+                    if self.headers.get("If-None-Match") == server.etag:
+                        self.send_response(304)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.reply(server.catalog_body, "application/json", {"ETag": server.etag})
+                    return
+                match = image_pattern.match(self.path)
+                if match:
+                    self.reply(server.images[int(match.group(1)) % IMAGE_VARIANTS], "image/png")
+                    return
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def reply(self, body, content_type, headers=None):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def peak_rss_mb():
+    """Peak resident set size of this (per-benchmark) process, or None where it can't be read."""
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentile(sorted_samples, p):
+    return sorted_samples[max(0, math.ceil(p * len(sorted_samples)) - 1)]
+
+
+def measure(fn, count):
+    """Calls fn(i) for i in range(count); returns the per-call latency summary."""
+    samples = []
+    started = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t)
+    total = time.perf_counter() - started
+    samples.sort()
+    rss = peak_rss_mb()
+    return {
+        "count": count,
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 4),
+        "mean_ms": round(total / count * 1000, 4),
+        "ops_per_s": round(count / total, 1) if total else None,
+        "peak_rss_mb": round(rss, 1) if rss is not None else None,
+    }
+
+
+class BenchmarkSuite:
+    def __init__(self, root, base_url, items, iterations):
+        self.root = root
+        self.base_url = base_url
+        self.items = items
+        self.iterations = iterations
+        self.catalog = make_catalog(items)
+        self.ids = [img_id for items in self.catalog.values() for img_id in items]
+        self.managers = []
+        os.makedirs(root, exist_ok=True)
+
+    def manager(self, base_dir=None):
+        """DataManager over `base_dir`, or a fresh directory."""
+        if base_dir is None:
+            base_dir = os.path.join(self.root, f"dm{len(self.managers)}")
+            os.makedirs(base_dir)
+        dm = DataManager(base_dir=base_dir, base_url=self.base_url)
+        self.managers.append(dm)
+        return dm
+
+    def close(self):
+        # Flush now; the atexit handlers would run after the temporary directory is gone
+        for dm in self.managers:
+            dm.stop_warming()
+            dm.thumbnails.flush()
+            dm.store.flush_favorites()
+            dm.store.flush_access()
+            # Render workers must be gone before this process can exit
+            dm.thumbnails.engine.close()
+
+    def benchmarks(self):
+        """(name, setup) pairs; setup() prepares state and returns (fn, count) to measure."""
+        yield "catalog_parse", self.catalog_parse
+        yield "catalog_load", self.catalog_load
+        yield "fetch_latest_data_cold", self.fetch_cold
+        yield "fetch_latest_data_304", self.fetch_warm
+        yield "get_image_path_cold", self.image_path_cold
+        yield "get_image_path_warm", self.image_path_warm
+        yield "thumbnail_cold", self.thumbnail_cold
+        yield "thumbnail_disk", self.thumbnail_disk
+        yield "thumbnail_memory", self.thumbnail_memory
+        yield "favorites_toggle", self.favorites_toggle
+        for size in GRID_SIZES:
+            yield f"grid_scroll_{size}", lambda size=size: self.grid_scroll(size)
+            yield f"grid_resize_{size}", lambda size=size: self.grid_resize(size)
+
+    # Catalog
+
+    def catalog_parse(self):
+        body = catalog_body(self.catalog)
+        return (lambda i: json.loads(body)), self.iterations
+
+    def catalog_load(self):
+        """Startup with a synced database: open the store and read the first category."""
+        dm = self.manager()
+        dm.fetch_latest_data()
+        base_dir = os.path.dirname(dm.cache_dir)
+
+        def load(i):
+            manager = self.manager(base_dir)
+            first = next(iter(manager.data))
+            len(manager.data[first])
+        return load, self.iterations
+
+    def fetch_cold(self):
+        managers = [self.manager() for _ in range(self.iterations)]
+        return (lambda i: managers[i].fetch_latest_data()), self.iterations
+
+    def fetch_warm(self):
+        dm = self.manager()
+        dm.fetch_latest_data()
+        return (lambda i: dm.fetch_latest_data()), self.iterations
+
+    # Images
+
+    def image_ids(self):
+        return self.ids[:min(len(self.ids), 200)]
+
+    def image_path_cold(self):
+        dm = self.manager()
+        ids = self.image_ids()
+        return (lambda i: dm.get_image_path(ids[i])), len(ids)
+
+    def image_path_warm(self):
+        dm = self.manager()
+        ids = self.image_ids()
+        for img_id in ids:
+            dm.get_image_path(img_id)
+        return (lambda i: dm.get_image_path(ids[i % len(ids)])), len(ids) * 5
+
+    def card_pipeline(self, dm, cache):
+        """The load path ImageCard runs on its loader threads."""
+        from ui.thumbnail_cache import load_card_thumbnail
+        return lambda img_id: load_card_thumbnail(dm, cache, img_id, THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+
+    def thumbnail_setup(self):
+        from ui.thumbnail_cache import ThumbnailCache
+        dm = self.manager()
+        ids = self.image_ids()
+        for img_id in ids:
+            dm.get_image_path(img_id)
+        return dm, ids, ThumbnailCache()
+
+    def thumbnail_cold(self):
+        """Source cached on disk, thumbnail rendered for the first time."""
+        dm, ids, cache = self.thumbnail_setup()
+        load = self.card_pipeline(dm, cache)
+        return (lambda i: load(ids[i])), len(ids)
+
+    def thumbnail_disk(self):
+        """Persistent thumbnail hit with an empty memory cache (e.g. after a restart)."""
+        dm, ids, cache = self.thumbnail_setup()
+        for img_id in ids:
+            dm.get_thumbnail(img_id, THUMBNAIL_SIZE)
+        load = self.card_pipeline(dm, cache)
+        return (lambda i: load(ids[i])), len(ids)
+
+    def thumbnail_memory(self):
+        dm, ids, cache = self.thumbnail_setup()
+        load = self.card_pipeline(dm, cache)
+        for img_id in ids:
+            load(img_id)
+        return (lambda i: load(ids[i % len(ids)])), len(ids) * 5
+
+    def favorites_toggle(self):
+        dm = self.manager()
+        dm.fetch_latest_data()
+        ids = self.image_ids()
+        return (lambda i: dm.toggle_favorite(ids[i % len(ids)])), len(ids) * 2
+
+    # Grid layout math
+
+    def grid_scroll(self, size):
+        """One frame per scroll step through the whole category: window plus card positions."""
+        width, height = VIEWPORT
+        columns = compute_columns(width)
+        tops = range(0, max(1, content_height(size, columns) - height), SCROLL_STEP)
+        tops = list(tops) or [0]
+
+        def frame(i):
+            start, end = visible_range(tops[i % len(tops)], height, size, columns)
+            for index in range(start, end):
+                cell_position(index, columns, width)
+        return frame, max(len(tops), self.iterations)
+
+    def grid_resize(self, size):
+        """Relayout of the visible window while the window width is dragged."""
+        width, height = VIEWPORT
+
+        def frame(i):
+            w = width - 200 + (i * 7) % 400
+            columns = compute_columns(w)
+            content_height(size, columns)
+            start, end = visible_range(size * 40 % max(1, content_height(size, columns)), height, size, columns)
+            for index in range(start, end):
+                cell_position(index, columns, w)
+        return frame, max(100, self.iterations)
+
+    def names(self, filters=()):
+        return [name for name, _ in self.benchmarks() if not filters or any(f in name for f in filters)]
+
+    def measure(self, name):
+        fn, count = dict(self.benchmarks())[name]()
+        return measure(fn, count)
+
+
+def run_benchmark(name, root, base_url, items, iterations):
+    """Runs one benchmark; called in a fresh process."""
+    suite = BenchmarkSuite(os.path.join(root, name), base_url, items, iterations)
+    try:
+        return suite.measure(name)
+    finally:
+        suite.close()
+
+
+def run_suite(root, base_url, items, iterations, filters=()):
+    """Runs each benchmark in its own spawned process, one after another."""
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in BenchmarkSuite(root, base_url, items, iterations).names(filters):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(run_benchmark, name, root, base_url, items, iterations).result()
+        print(format_row(name, results[name]), flush=True)
+    return results
+
+
+def format_row(name, result):
+    rss = result["peak_rss_mb"]
+    return (f"{name:<26} n={result['count']:<6} p50 {result['p50_ms']:>9.3f} ms  "
+            f"p95 {result['p95_ms']:>9.3f} ms  {result['ops_per_s'] or 0:>10.1f} ops/s  "
+            f"peak RSS {rss if rss is not None else '?'} MiB")
+
+
+def compare(results, baseline, tolerance):
+    """Prints p50 changes against a baseline; returns the names that regressed."""
+    regressions = []
+    print(f"\nCompared with baseline from {baseline.get('created', '?')}:")
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:<26} (new)")
+            continue
+        delta = result["p50_ms"] - old["p50_ms"]
+        change = delta / old["p50_ms"] if old["p50_ms"] else 0.0
+        regressed = change > tolerance and delta > NOISE_FLOOR_MS
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<26} p50 {old['p50_ms']:>9.3f} -> {result['p50_ms']:>9.3f} ms "
+              f"({change:+.0%}){'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data and thumbnail hot paths headlessly.")
+    parser.add_argument("-k", dest="filters", action="append", default=[],
+                        help="only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--items", type=int, default=2000, help="synthetic catalog size")
+    parser.add_argument("--iterations", type=int, default=20, help="repetitions for whole-operation benchmarks")
+    parser.add_argument("--save", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    server = SyntheticServer(make_catalog(args.items))
+    try:
+        # Windows can't delete the still-open databases; leftovers are only temp files
+        with tempfile.TemporaryDirectory(prefix="bgbench-", ignore_cleanup_errors=True) as root:
+            results = run_suite(root, server.base_url, args.items, args.iterations, args.filters)
+    finally:
+        server.close()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "items": args.items,
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.save}")
+    if baseline is not None and compare(results, baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
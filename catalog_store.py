@@ -0,0 +1,352 @@
+import time
+import atexit
+import sqlite3
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS catalog (
+    category TEXT NOT NULL,
+    img_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    desc TEXT,
+    PRIMARY KEY (category, img_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS catalog_by_position ON catalog (category, position);
+CREATE INDEX IF NOT EXISTS catalog_by_id ON catalog (img_id);
+CREATE TABLE IF NOT EXISTS favorites (
+    img_id TEXT PRIMARY KEY,
+    added REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cache_meta (
+    img_id TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    digest TEXT,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_by_access ON cache_meta (last_access);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Cache hits only update last_access in memory; they are written in batches of this size
+ACCESS_BATCH = 64
+# Favorite toggles are written this long after the last one, off the caller's thread
+FAVORITES_DELAY = 0.5
+# Max host parameters per statement on older SQLite builds
+QUERY_CHUNK = 500
+
+
+def chunked(items, size=QUERY_CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class CatalogStore:
+    """SQLite store for the catalog, favorites, cache metadata and sync state.
+
+    Every thread gets its own connection; the database runs in WAL mode so the UI
+    keeps reading while a background sync writes. Writes are serialized by one lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        self.access_lock = threading.Lock()
+        self.pending_access = {}  # img_id -> last access time not yet written
+        self.favorites_lock = threading.Lock()
+        self.pending_favorites = {}  # img_id -> (is_fav, toggled at) not yet written
+        self.favorites_timer = None
+        self.favorites_flush_lock = threading.Lock()  # Keeps batches in toggle order
+        with self.transaction() as conn:
+            conn.executescript(SCHEMA)
+        atexit.register(self.flush_access)
+        atexit.register(self.flush_favorites)
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        with self.write_lock:
+            conn = self.connection()
+            with conn:
+                yield conn
+
+    def query(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    # Catalog
+
+    def categories(self):
+        return [row[0] for row in self.query("SELECT name FROM categories ORDER BY position")]
+
+    def count(self, category):
+        rows = self.query("SELECT count FROM categories WHERE name = ?", (category,))
+        return rows[0][0] if rows else 0
+
+    def category_items(self, category, offset=0, limit=None):
+        """{img_id: desc} of one category in catalog order; offset/limit select a page."""
+        rows = self.query(
+            "SELECT img_id, desc FROM catalog WHERE category = ? ORDER BY position LIMIT ? OFFSET ?",
+            (category, -1 if limit is None else limit, offset))
+        return dict(rows)
+
+    def category_of(self, img_id):
+        """First category (in catalog order) listing img_id, or None."""
+        rows = self.query(
+            "SELECT c.category FROM catalog c JOIN categories k ON k.name = c.category "
+            "WHERE c.img_id = ? ORDER BY k.position LIMIT 1", (img_id,))
+        return rows[0][0] if rows else None
+
+    def describe(self, img_ids):
+        """{img_id: desc} for the ids still in the catalog, in the order given."""
+        found = {}
+        for chunk in chunked(img_ids):
+            marks = ",".join("?" * len(chunk))
+            found.update(self.query(f"SELECT img_id, desc FROM catalog WHERE img_id IN ({marks})", chunk))
+        return {img_id: found[img_id] for img_id in img_ids if img_id in found}
+
+    def all_ids(self):
+        """Every distinct id, ordered by its first category then position."""
+        rows = self.query(
+            "SELECT c.img_id FROM catalog c JOIN categories k ON k.name = c.category "
+            "ORDER BY k.position, c.position")
+        return list(dict.fromkeys(row[0] for row in rows))
+
+    def search_text(self, terms, limit=None):
+        """Ids whose description or id contains every term, in catalog order (unindexed LIKE scan)."""
+        if not terms:
+            return []
+        patterns = ["%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                    for term in terms]
+        clauses = " AND ".join("(c.desc LIKE ? ESCAPE '\\' OR c.img_id LIKE ? ESCAPE '\\')" for _ in terms)
+        rows = self.query(
+            "SELECT c.img_id FROM catalog c JOIN categories k ON k.name = c.category "
+            f"WHERE {clauses} ORDER BY k.position, c.position",
+            [p for pattern in patterns for p in (pattern, pattern)])
+        ids = list(dict.fromkeys(row[0] for row in rows))
+        return ids[:limit] if limit else ids
+
+    def id_count(self):
+        return self.query("SELECT COUNT(DISTINCT img_id) FROM catalog")[0][0]
+
+    def write_catalog(self, data, old=None):
+        """Stores `data` ({category: {img_id: desc}}), rewriting only categories that changed."""
+        old = old or {}
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM categories")
+            for position, (category, items) in enumerate(data.items()):
+                self._write_category(conn, category, position, items, old.get(category))
+            conn.execute("DELETE FROM catalog WHERE category NOT IN (SELECT name FROM categories)")
+
+    def write_category(self, category, position, items, old_items=None):
+        """Stores one category as soon as it has been received (streaming sync)."""
+        with self.transaction() as conn:
+            self._write_category(conn, category, position, items, old_items)
+
+    def prune_categories(self, names):
+        """Drops every category not in `names`, once a streamed catalog is complete."""
+        with self.transaction() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS synced (name TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM synced")
+            conn.executemany("INSERT OR IGNORE INTO synced VALUES (?)", ((name,) for name in names))
+            conn.execute("DELETE FROM categories WHERE name NOT IN (SELECT name FROM synced)")
+            conn.execute("DELETE FROM catalog WHERE category NOT IN (SELECT name FROM categories)")
+
+    def _write_category(self, conn, category, position, items, old_items):
+        conn.execute("INSERT OR REPLACE INTO categories VALUES (?, ?, ?)", (category, position, len(items)))
+        if old_items is not None and list(old_items.items()) == list(items.items()):
+            return
+        conn.execute("DELETE FROM catalog WHERE category = ?", (category,))
+        conn.executemany("INSERT INTO catalog VALUES (?, ?, ?, ?)",
+                         ((category, img_id, i, desc) for i, (img_id, desc) in enumerate(items.items())))
+
+    # Favorites
+
+    def load_favorites(self):
+        return [row[0] for row in self.query("SELECT img_id FROM favorites ORDER BY added")]
+
+    def set_favorite(self, img_id, is_fav):
+        """Queues a toggle for the debounced writer; never waits on the write lock."""
+        with self.favorites_lock:
+            self.pending_favorites[img_id] = (is_fav, time.time())
+            if self.favorites_timer is None:
+                self.favorites_timer = threading.Timer(FAVORITES_DELAY, self.flush_favorites)
+                self.favorites_timer.daemon = True
+                self.favorites_timer.start()
+
+    def flush_favorites(self):
+        with self.favorites_flush_lock:
+            with self.favorites_lock:
+                if self.favorites_timer is not None:
+                    self.favorites_timer.cancel()
+                    self.favorites_timer = None
+                pending, self.pending_favorites = self.pending_favorites, {}
+            if not pending:
+                return
+            with self.transaction() as conn:
+                conn.executemany("INSERT OR REPLACE INTO favorites VALUES (?, ?)",
+                                 ((img_id, t) for img_id, (is_fav, t) in pending.items() if is_fav))
+                conn.executemany("DELETE FROM favorites WHERE img_id = ?",
+                                 ((img_id,) for img_id, (is_fav, _) in pending.items() if not is_fav))
+
+    def import_favorites(self, img_ids):
+        now = time.time()
+        with self.transaction() as conn:
+            # Tiny offsets keep the original order
+            conn.executemany("INSERT OR IGNORE INTO favorites VALUES (?, ?)",
+                             ((img_id, now + i * 1e-6) for i, img_id in enumerate(img_ids)))
+
+    # Cache metadata
+
+    def cache_entry(self, img_id):
+        """(size, digest, last_access) of a cached image, or None."""
+        rows = self.query("SELECT size, digest, last_access FROM cache_meta WHERE img_id = ?", (img_id,))
+        return rows[0] if rows else None
+
+    def cached_ids(self):
+        return {row[0] for row in self.query("SELECT img_id FROM cache_meta")}
+
+    def cache_entries(self):
+        """(img_id, size) of every cached image, least recently used first."""
+        self.flush_access()
+        return self.query("SELECT img_id, size FROM cache_meta ORDER BY last_access")
+
+    def cache_digests(self):
+        """img_id -> content digest of every cached image (None if it was never hashed)."""
+        return dict(self.query("SELECT img_id, digest FROM cache_meta"))
+
+    def set_digests(self, entries):
+        """Stores (digest, img_id) pairs for images cached without a digest."""
+        with self.transaction() as conn:
+            conn.executemany("UPDATE cache_meta SET digest = ? WHERE img_id = ?", entries)
+
+    def cache_totals(self):
+        """(file count, total bytes) of the cached images."""
+        count, total = self.query("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_meta")[0]
+        return count, total
+
+    def record_cached(self, entries):
+        """Stores (img_id, size, digest, last_access) rows."""
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO cache_meta VALUES (?, ?, ?, ?)", entries)
+
+    def forget_cached(self, img_ids):
+        with self.access_lock:
+            for img_id in img_ids:
+                self.pending_access.pop(img_id, None)
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM cache_meta WHERE img_id = ?", ((i,) for i in img_ids))
+
+    def touch(self, img_id):
+        """Notes a cache hit; written with the next batch."""
+        with self.access_lock:
+            self.pending_access[img_id] = time.time()
+            full = len(self.pending_access) >= ACCESS_BATCH
+        if full:
+            self.flush_access()
+
+    def flush_access(self):
+        with self.access_lock:
+            pending, self.pending_access = self.pending_access, {}
+        if pending:
+            with self.transaction() as conn:
+                conn.executemany("UPDATE cache_meta SET last_access = ? WHERE img_id = ?",
+                                 ((t, img_id) for img_id, t in pending.items()))
+
+    # Sync state
+
+    def get_state(self, key, default=None):
+        rows = self.query("SELECT value FROM sync_state WHERE key = ?", (key,))
+        return rows[0][0] if rows else default
+
+    def set_state(self, **values):
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", values.items())
+
+
+class CatalogView(Mapping):
+    """Read-only {category: {img_id: desc}} view that loads each category on first access."""
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.names = None
+        self.loaded = {}
+
+    def reset(self):
+        """Drops loaded categories after the stored catalog changed."""
+        with self.lock:
+            self.names = None
+            self.loaded = {}
+
+    def invalidate(self, category):
+        """Drops one category (and the name list) after a streamed sync rewrote it."""
+        with self.lock:
+            self.names = None
+            self.loaded.pop(category, None)
+
+    def keys_list(self):
+        with self.lock:
+            if self.names is None:
+                self.names = self.store.categories()
+            return self.names
+
+    def __getitem__(self, category):
+        with self.lock:
+            items = self.loaded.get(category)
+        if items is None:
+            if category not in self.keys_list():
+                raise KeyError(category)
+            items = self.store.category_items(category)
+            with self.lock:
+                self.loaded[category] = items
+        return items
+
+    def __contains__(self, category):
+        return category in self.keys_list()
+
+    def __iter__(self):
+        return iter(self.keys_list())
+
+    def __len__(self):
+        return len(self.keys_list())
+
+
+class CategoryIndex(Mapping):
+    """Read-only {img_id: category} view answered by indexed queries."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, img_id):
+        category = self.store.category_of(img_id)
+        if category is None:
+            raise KeyError(img_id)
+        return category
+
+    def __contains__(self, img_id):
+        return bool(self.store.query("SELECT 1 FROM catalog WHERE img_id = ? LIMIT 1", (img_id,)))
+
+    def __iter__(self):
+        return iter(self.store.all_ids())
+
+    def __len__(self):
+        return self.store.id_count()
@@ -0,0 +1,113 @@
+import re
+import json
+import codecs
+
+JSON_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+# Skips everything up to the next brace outside a string in one match; stops early at a
+# quote whose string hasn't fully arrived yet
+VALUE_BODY = re.compile(r'(?:[^"{}]++|' + JSON_STRING.pattern + r')*+', re.S)
+WHITESPACE = " \t\r\n"
+
+
+class CatalogStreamParser:
+    """Incremental parser for the {category: {img_id: desc}} catalog document.
+
+    feed() takes text as it arrives and returns the categories completed by it. Only the
+    category being received is buffered; each one is decoded with json once it is whole.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.state = "start"  # start -> key -> colon -> value -> (comma -> key)* -> end
+        self.category = None
+        # Scan position and brace depth inside the current value
+        self.scan = 0
+        self.depth = 0
+
+    def feed(self, text):
+        self.buffer += text
+        completed = []
+        while self.step(completed):
+            pass
+        return completed
+
+    def close(self):
+        if self.state != "end" or self.buffer.strip(WHITESPACE):
+            raise ValueError("truncated or malformed catalog")
+
+    def skip_whitespace(self):
+        self.buffer = self.buffer.lstrip(WHITESPACE)
+        return self.buffer[:1]
+
+    def step(self, completed):
+        """Advances one token; returns False when more input is needed."""
+        if self.state == "value":
+            return self.scan_value(completed)
+        char = self.skip_whitespace()
+        if not char or self.state == "end":
+            return False
+        if self.state == "start":
+            self.expect(char, "{")
+            self.buffer = self.buffer[1:]
+            self.state = "key"
+        elif self.state in ("key", "comma"):
+            if char == "}":
+                self.buffer = self.buffer[1:]
+                self.state = "end"
+            elif self.state == "comma":
+                self.expect(char, ",")
+                self.buffer = self.buffer[1:]
+                self.state = "key"
+            else:
+                self.expect(char, '"')
+                match = JSON_STRING.match(self.buffer)
+                if match is None:
+                    return False
+                self.category = json.loads(match.group())
+                self.buffer = self.buffer[match.end():]
+                self.state = "colon"
+        elif self.state == "colon":
+            self.expect(char, ":")
+            self.buffer = self.buffer[1:]
+            self.state = "value"
+        return True
+
+    def scan_value(self, completed):
+        if self.scan == 0:
+            char = self.skip_whitespace()
+            if not char:
+                return False
+            self.expect(char, "{")
+        while True:
+            self.scan = VALUE_BODY.match(self.buffer, self.scan).end()
+            token = self.buffer[self.scan:self.scan + 1]
+            if token in ("", '"'):
+                # Resume here once more (or the rest of the string) has arrived
+                return False
+            self.scan += 1
+            if token == "{":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    break
+        items = json.loads(self.buffer[:self.scan])
+        completed.append((self.category, items))
+        self.buffer = self.buffer[self.scan:]
+        self.scan = 0
+        self.state = "comma"
+        return True
+
+    def expect(self, char, wanted):
+        if char != wanted:
+            raise ValueError(f"malformed catalog: expected {wanted!r}, got {char!r}")
+
+
+def iter_categories(chunks):
+    """Yields (category, {img_id: desc}) from an iterable of UTF-8 byte chunks as each completes."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    parser = CatalogStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(decoder.decode(chunk))
+    yield from parser.feed(decoder.decode(b"", final=True))
+    parser.close()
@@ -0,0 +1,199 @@
+import os
+import tempfile
+import threading
+import numpy as np
+from PIL import Image
+from image_bundle import open_image
+
+# Images are reduced to SAMPLE_SIZE^2 pixels before features are taken
+SAMPLE_SIZE = 32
+# Palette histogram: BINS levels per channel -> BINS^3 colour buckets
+BINS = 4
+BATCH_SIZE = 64
+
+# Query weights for mean colour, palette overlap and gradient direction
+MEAN_WEIGHT = 0.5
+PALETTE_WEIGHT = 0.4
+GRADIENT_WEIGHT = 0.1
+
+MAX_RGB_DISTANCE = float(np.sqrt(3 * 255 ** 2))
+
+
+def parse_hex(color):
+    """'#ff8800' / 'f80' -> (255, 136, 0)."""
+    color = color.strip().lstrip("#")
+    if len(color) == 3:
+        color = "".join(c * 2 for c in color)
+    if len(color) != 6:
+        raise ValueError(f"Not a hex colour: {color!r}")
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def palette_bin(rgb):
+    r, g, b = (int(c) * BINS // 256 for c in rgb)
+    return (r * BINS + g) * BINS + b
+
+
+def load_sample(path):
+    """Decodes one image into a SAMPLE_SIZE x SAMPLE_SIZE x 3 uint8 array."""
+    with open_image(path) as img:
+        img = img.convert("RGB").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.BOX)
+        return np.asarray(img, dtype=np.uint8)
+
+
+def compute_features(samples):
+    """Vectorized features for a (B, S, S, 3) batch: mean colour, palette histogram, gradient."""
+    pixels = samples.reshape(len(samples), -1, 3)
+    means = pixels.mean(axis=1, dtype=np.float32)
+
+    # Quantize every pixel to a palette bucket and count per image in a single bincount
+    q = (pixels.astype(np.int32) * BINS) // 256
+    buckets = (q[..., 0] * BINS + q[..., 1]) * BINS + q[..., 2]
+    buckets += np.arange(len(samples))[:, None] * BINS ** 3
+    hist = np.bincount(buckets.ravel(), minlength=len(samples) * BINS ** 3)
+    hist = hist.reshape(len(samples), BINS ** 3).astype(np.float32) / pixels.shape[1]
+
+    # Gradient direction from luminance differences between opposite halves
+    luma = samples.astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    half = SAMPLE_SIZE // 2
+    gx = luma[:, :, half:].mean(axis=(1, 2)) - luma[:, :, :half].mean(axis=(1, 2))
+    gy = luma[:, half:, :].mean(axis=(1, 2)) - luma[:, :half, :].mean(axis=(1, 2))
+    gradients = np.stack([gx, gy], axis=1) / 255.0
+    return means, hist, gradients.astype(np.float32)
+
+
+class ColorIndex:
+    """Array-backed colour feature store with vectorized nearest-neighbour queries."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        # Held for a whole build, so concurrent builds can't both add the same ids
+        self.build_lock = threading.Lock()
+        self.ids = []
+        self.positions = {}
+        self.means = np.zeros((0, 3), dtype=np.float32)
+        self.hist = np.zeros((0, BINS ** 3), dtype=np.float32)
+        self.gradients = np.zeros((0, 2), dtype=np.float32)
+        self.load()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, img_id):
+        return img_id in self.positions
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as arrays:
+                if arrays["hist"].shape[1] != BINS ** 3:
+                    return  # Stored with a different palette size; rebuild
+                ids = [str(i) for i in arrays["ids"]]
+                # Files written by concurrent builds may hold an id twice; keep its first row
+                first = {}
+                for i, img_id in enumerate(ids):
+                    first.setdefault(img_id, i)
+                keep = list(first.values())
+                self.ids = [ids[i] for i in keep]
+                self.means = arrays["means"][keep]
+                self.hist = arrays["hist"][keep]
+                self.gradients = arrays["gradients"][keep]
+            self.positions = {img_id: i for i, img_id in enumerate(self.ids)}
+        except Exception as e:
+            print(f"Failed to load colour index: {e}")
+
+    def save(self):
+        with self.lock:
+            arrays = dict(ids=np.array(self.ids, dtype=str), means=self.means,
+                          hist=self.hist, gradients=self.gradients)
+        # Unique temp file, so no two writers (or processes) ever share a half-written one
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp.npz", dir=os.path.dirname(self.path) or ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def add_batch(self, ids, paths):
+        """Decodes a batch of images and appends their features; unreadable images are skipped."""
+        samples, ok_ids = [], []
+        for img_id, path in zip(ids, paths):
+            try:
+                samples.append(load_sample(path))
+                ok_ids.append(img_id)
+            except Exception as e:
+                print(f"Failed to sample colours of {img_id}: {e}")
+        if not samples:
+            return 0
+        means, hist, gradients = compute_features(np.stack(samples))
+        with self.lock:
+            start = len(self.ids)
+            self.ids.extend(ok_ids)
+            self.positions.update((img_id, start + i) for i, img_id in enumerate(ok_ids))
+            self.means = np.concatenate([self.means, means])
+            self.hist = np.concatenate([self.hist, hist])
+            self.gradients = np.concatenate([self.gradients, gradients])
+        return len(ok_ids)
+
+    def build(self, items, batch_size=BATCH_SIZE):
+        """Adds features for (img_id, path) pairs not yet indexed, in batches. Returns how many."""
+        with self.build_lock:
+            todo = [(img_id, path) for img_id, path in items if img_id not in self.positions]
+            added = 0
+            for i in range(0, len(todo), batch_size):
+                batch = todo[i:i + batch_size]
+                added += self.add_batch([b[0] for b in batch], [b[1] for b in batch])
+            if added:
+                self.save()
+            return added
+
+    def remove(self, img_ids):
+        drop = set(img_ids)
+        with self.build_lock:
+            with self.lock:
+                keep = [i for i, img_id in enumerate(self.ids) if img_id not in drop]
+                if len(keep) == len(self.ids):
+                    return
+                self.ids = [self.ids[i] for i in keep]
+                self.positions = {img_id: i for i, img_id in enumerate(self.ids)}
+                self.means = self.means[keep]
+                self.hist = self.hist[keep]
+                self.gradients = self.gradients[keep]
+            self.save()
+
+    def _top(self, scores, limit, exclude=None):
+        if limit and len(scores) > limit + 1:
+            # Partial selection first so only the winners get fully sorted
+            part = np.argpartition(scores, limit)[:limit + 1]
+            order = part[np.argsort(scores[part], kind="stable")]
+        else:
+            order = np.argsort(scores, kind="stable")
+        result = [self.ids[i] for i in order if self.ids[i] != exclude]
+        return result[:limit] if limit else result
+
+    def nearest_to_color(self, rgb, limit=60):
+        """Ids ranked by closeness of their mean colour and palette to the given colour."""
+        with self.lock:
+            if not self.ids:
+                return []
+            target = np.asarray(rgb, dtype=np.float32)
+            mean_dist = np.linalg.norm(self.means - target, axis=1) / MAX_RGB_DISTANCE
+            palette_dist = 1.0 - self.hist[:, palette_bin(rgb)]
+            scores = MEAN_WEIGHT * mean_dist + PALETTE_WEIGHT * palette_dist
+            return self._top(scores, limit)
+
+    def nearest_to_image(self, img_id, limit=60):
+        """Ids whose colour features are closest to an indexed image's, excluding itself."""
+        with self.lock:
+            pos = self.positions.get(img_id)
+            if pos is None:
+                return []
+            mean_dist = np.linalg.norm(self.means - self.means[pos], axis=1) / MAX_RGB_DISTANCE
+            palette_dist = np.abs(self.hist - self.hist[pos]).sum(axis=1) / 2
+            grad_dist = np.linalg.norm(self.gradients - self.gradients[pos], axis=1) / 2
+            scores = MEAN_WEIGHT * mean_dist + PALETTE_WEIGHT * palette_dist + GRADIENT_WEIGHT * grad_dist
+            return self._top(scores, limit, exclude=img_id)
@@ -1,21 +1,135 @@
 import os
 import json
-import requests
+import time
+import atexit
 import threading
-from PIL import Image
+from collections import deque
+from catalog_store import CatalogStore, CatalogView, CategoryIndex
+from search_index import SearchIndex
+from downloader import Downloader, DOWNLOAD_WORKERS, file_digest
+from thumbnail_store import ThumbnailStore, THUMBNAIL_SIZE
+from thumbnail_engine import ThumbnailEngine
+from image_bundle import load_bundles
+from catalog_stream import iter_categories
+from metrics import METRICS
+
+DEFAULT_BASE_URL = "https://raz1ner.com"
+CATALOG_PATH = "/Extension/Background-Color-Post/color.json"
+IMAGE_PATH = "/images/Background-Color/{img_id}-2x.png"
+
+# Disk budget for downloaded images; eviction frees down to EVICT_TARGET of it
+CACHE_BUDGET = 1024 * 1024 * 1024
+EVICT_TARGET = 0.9
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Read size for the streamed catalog download
+CATALOG_CHUNK = 64 * 1024
+
+# Images cached during a session are colour-indexed in batches of this many
+COLOR_BATCH = 64
+
+
+def is_valid_image(path):
+    """Cheap structural check of a cached PNG: signature and a final IEND chunk."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read(8) != PNG_SIGNATURE:
+                return False
+            f.seek(-12, os.SEEK_END)
+            return f.read(12)[4:8] == b"IEND"
+    except OSError:
+        return False
+
+
+def diff_catalog(old, new):
+    """Per-category lists of added, removed and re-described ids between two catalogs."""
+    diff = {}
+    for cat in old.keys() | new.keys():
+        old_items = old.get(cat, {})
+        new_items = new.get(cat, {})
+        added = [img_id for img_id in new_items if img_id not in old_items]
+        removed = [img_id for img_id in old_items if img_id not in new_items]
+        changed = [img_id for img_id, desc in new_items.items()
+                   if img_id in old_items and old_items[img_id] != desc]
+        if added or removed or changed:
+            diff[cat] = {"added": added, "removed": removed, "changed": changed}
+    return diff
+
 
 class DataManager:
-    def __init__(self):
-        self.cache_dir = "cache"
-        self.data_file = "color_data.json"
-        self.favorites_file = "favorites.json"
+    def __init__(self, base_dir=".", base_url=DEFAULT_BASE_URL, download_workers=DOWNLOAD_WORKERS,
+                 cache_budget=CACHE_BUDGET):
+        self.cache_dir = os.path.join(base_dir, "cache")
+        self.bundle_dir = os.path.join(base_dir, "bundles")
+        self.db_file = os.path.join(base_dir, "background.db")
+        # JSON files written by older versions, imported into the database once
+        self.data_file = os.path.join(base_dir, "color_data.json")
+        self.favorites_file = os.path.join(base_dir, "favorites.json")
+        self.sync_meta_file = os.path.join(base_dir, "color_data.meta.json")
+
+        # Remote endpoints; overridable so tools can point at a mirror or a local test server
+        self.catalog_url = base_url + CATALOG_PATH
+        self.image_url = base_url + IMAGE_PATH
+
+        # Result of the last catalog sync and the ids it queued for cache warming
+        self.last_sync_diff = {}
+        self.warm_queue = deque()
+        self.queued_for_warming = set()
+        self.warm_lock = threading.Lock()
+        self.warming = False
+        self.warm_stopped = False
+        # Queued warming is dropped at exit instead of racing the thumbnail engine's shutdown
+        atexit.register(self.stop_warming)
         
         # Ensure cache directory exists
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
+
+        # Shared keep-alive session for catalog and image downloads
+        self.downloader = Downloader(workers=download_workers)
+
+        # Persistent tier of rendered card thumbnails, with misses
+        # rendered by a process pool so decode/resampling scales past the GIL
+        self.thumbnails = ThumbnailStore(os.path.join(self.cache_dir, "thumbs"), engine=ThumbnailEngine())
             
-        self.data = self.load_data()
-        self.favorites = self.load_favorites()
+        # Catalog, favorites, cache metadata and sync state
+        self.store = CatalogStore(self.db_file)
+        self.migrate_legacy_files()
+
+        # Image cache accounting; a falsy budget means unbounded
+        self.cache_budget = cache_budget
+        self.cache_lock = threading.Lock()
+        self.evict_lock = threading.Lock()
+        self.cache_files, self.cache_bytes = self.store.cache_totals()
+        self.cache_counters = dict.fromkeys(("hits", "misses", "evictions", "repairs", "bundle_hits"), 0)
+        METRICS.gauge("image_cache", self.cache_stats)
+
+        # Pre-baked image packs shipped with the installer (or built by prefetch.py --bundle);
+        # mapped read-only and consulted before the per-file cache
+        self.bundles = load_bundles(self.bundle_dir)
+
+        # Categories are read on first access; the reverse index img_id -> category is a query
+        self.data = CatalogView(self.store)
+        self.index = CategoryIndex(self.store)
+        # Insertion-ordered img_id -> None; toggles are written to the store behind the UI
+        self.favorites = dict.fromkeys(self.store.load_favorites())
+
+        # Colour feature store; loaded on first use so NumPy stays out of startup
+        self.color_index = None
+        self.color_lock = threading.Lock()
+        # Images cached since the last colour index update, and whether one is running
+        self.color_pending = 0
+        self.color_flush = False
+        self.color_updating = False
+
+        # Perceptual hashes for near-duplicate detection; img_id -> canonical id of its group
+        self.phash_index = None
+        self.duplicate_of = {}
+
+        # Full-text index over descriptions, built on first search
+        self.search_index = None
+        self.search_lock = threading.Lock()
         
         # English to Chinese mappings from the website
         self.category_names = {
@@ -40,53 +154,480 @@ class DataManager:
             'plant': '植物'
         }
 
-    def fetch_latest_data(self):
-        """Fetches the latest data from the URL on a background thread."""
+    def fetch_latest_data(self, on_category=None):
+        """Streams the latest data from the URL on a background thread.
+
+        Each category is stored, and reported through on_category(category), as soon as it has
+        been received. Uses the stored ETag / Last-Modified so an unchanged catalog costs a single 304.
+        """
+        headers = {}
+        if self.data:
+            etag = self.store.get_state("etag")
+            last_modified = self.store.get_state("last_modified")
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
         try:
-            response = requests.get("https://raz1ner.com/Extension/Background-Color-Post/color.json", timeout=10)
-            if response.status_code == 200:
-                self.data = response.json()
-                with open(self.data_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.data, f, ensure_ascii=False, indent=2)
-                return True
+            with METRICS.span("catalog.fetch_ms"), \
+                    self.downloader.get(self.catalog_url, headers=headers, stream=True) as response:
+                METRICS.incr(f"catalog.http_{response.status_code}")
+                if response.status_code == 304:
+                    self.last_sync_diff = {}
+                    return True
+                if response.status_code == 200:
+                    self.ingest_catalog(response.iter_content(CATALOG_CHUNK), on_category)
+                    # Saved last: an interrupted download is fetched in full next time
+                    self.store.set_state(etag=response.headers.get("ETag"),
+                                         last_modified=response.headers.get("Last-Modified"))
+                    return True
         except Exception as e:
             print(f"Failed to fetch data: {e}")
+            # Categories stored before the failure stay; drop views of the rest
+            self.data.reset()
         return False
 
-    def load_data(self):
-        """Loads cached data if available."""
-        if os.path.exists(self.data_file):
+    def ingest_catalog(self, chunks, on_category=None):
+        """Stores a catalog streamed as byte chunks, one category at a time.
+
+        Only the category being parsed and its stored predecessor are held in memory. Ids new
+        to the catalog are queued for warming as each category arrives (except on the very
+        first sync, where the UI loads the first category as soon as it is reported); ids
+        gone from the whole catalog are purged once the last category has arrived.
+        """
+        started = time.perf_counter()
+        warm = bool(self.data)
+        old_names = set(self.store.categories())
+        seen = []
+        diff = {}
+        removed = set()
+        for position, (category, items) in enumerate(iter_categories(chunks)):
+            old_items = self.store.category_items(category) if category in old_names else {}
+            changes = diff_catalog({category: old_items}, {category: items})
+            new_ids = []
+            if changes and warm:
+                # Ids that merely moved here from another category, stored or already
+                # rewritten in this sync, are already cached
+                new_ids = [img_id for img_id in changes[category]["added"]
+                           if img_id not in removed and img_id not in self.index
+                           and not self.is_cached(img_id)]
+                removed.update(changes[category]["removed"])
+            if position == 0:
+                # Until the last category is in, the stored validators no longer describe the
+                # store; a failed stream must not turn into a 304 over a half-applied catalog
+                self.store.set_state(etag=None, last_modified=None)
+            # Unchanged categories only get their position updated
+            self.store.write_category(category, position, items, old_items)
+            self.data.invalidate(category)
+            seen.append(category)
+            diff.update(changes)
+            if position == 0:
+                METRICS.observe("catalog.first_category_ms", (time.perf_counter() - started) * 1000)
+            if new_ids:
+                self.queue_warming(new_ids)
+                self.start_warming()
+            if on_category:
+                on_category(category)
+        for category in old_names.difference(seen):
+            diff[category] = {"added": [], "removed": list(self.store.category_items(category)), "changed": []}
+        self.store.prune_categories(seen)
+        self.data.reset()
+        self.update_index(diff)
+        self.apply_sync_diff(diff, warm=False)
+
+    def update_index(self, diff):
+        """Applies a sync diff to the search index; the category index reads the store directly."""
+        with self.search_lock:
+            if self.search_index is not None:
+                self.search_index.update(diff, self.data, self.index)
+
+    def get_category_count(self, cat_key):
+        return self.store.count(cat_key)
+
+    def build_search_index(self):
+        """Builds the search index on a background thread, so no keystroke pays for it."""
+        search_index = SearchIndex()
+        for category in self.store.categories():
+            # Read from the store directly so the view doesn't keep every category loaded
+            search_index.build({category: self.store.category_items(category)})
+        with self.search_lock:
+            self.search_index = search_index
+
+    def search(self, query, limit=None):
+        """Backgrounds whose description (or id) matches the query, as {img_id: desc}."""
+        with self.search_lock:
+            search_index = self.search_index
+            if search_index is not None:
+                ids = search_index.search(query, limit)
+        if search_index is None:
+            # Index still building: answer with a plain substring query meanwhile
+            ids = self.store.search_text(query.split(), limit)
+        return self.store.describe(ids)
+
+    def get_color_index(self):
+        with self.color_lock:
+            if self.color_index is None:
+                from color_index import ColorIndex
+                self.color_index = ColorIndex(os.path.join(self.cache_dir, "color_features.npz"))
+            return self.color_index
+
+    def update_color_index(self):
+        """Extracts colour features for cached images that don't have them yet (background thread)."""
+        color_index = self.get_color_index()
+        return color_index.build(self.cached_items(exclude=color_index))
+
+    def queue_color_update(self, flush=False):
+        """Colour-indexes images cached this session once COLOR_BATCH have piled up (or now, on flush)."""
+        with self.color_lock:
+            if not flush:
+                self.color_pending += 1
+            elif self.color_pending:
+                self.color_flush = True
+            if self.color_updating or not (self.color_flush or self.color_pending >= COLOR_BATCH):
+                return
+            self.color_updating = True
+        threading.Thread(target=self._color_worker, daemon=True).start()
+
+    def _color_worker(self):
+        while True:
+            with self.color_lock:
+                if not (self.color_flush or self.color_pending >= COLOR_BATCH):
+                    self.color_updating = False
+                    return
+                self.color_pending = 0
+                self.color_flush = False
             try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
+                self.update_color_index()
+            except Exception as e:
+                print(f"Failed to update colour index: {e}")
+
+    def cached_items(self, order=None, exclude=()):
+        """(img_id, source) of local images in catalog order, skipping ids in `exclude`.
+
+        The source is a cache file path, or a BundleEntry for bundled images.
+        """
+        cached = self.store.cached_ids()
+        items = []
+        for img_id in (order or self.store.all_ids()):
+            if img_id in exclude:
+                continue
+            entry = self.bundle_entry(img_id)
+            if entry is not None:
+                items.append((img_id, entry))
+            elif img_id in cached:
+                items.append((img_id, os.path.join(self.cache_dir, f"{img_id}.png")))
+        return items
+
+    def find_similar_colors(self, color, limit=60):
+        """Backgrounds closest to a hex colour across all categories, as {img_id: desc} (background thread)."""
+        from color_index import parse_hex
+        ids = self.get_color_index().nearest_to_color(parse_hex(color), limit)
+        return self.store.describe(ids)
+
+    def find_similar_to(self, img_id, limit=60):
+        """Backgrounds whose colours resemble the given image, as {img_id: desc} (background thread).
+
+        An image that isn't indexed yet is decoded and added to the feature file first.
+        """
+        color_index = self.get_color_index()
+        if img_id not in color_index:
+            source = self.get_image_source(img_id)
+            if source:
+                color_index.build([(img_id, source)])
+        ids = [img_id] + color_index.nearest_to_image(img_id, limit)
+        return self.store.describe(ids)
+
+    def get_phash_index(self):
+        with self.color_lock:
+            if self.phash_index is None:
+                from phash_index import PHashIndex
+                self.phash_index = PHashIndex(os.path.join(self.cache_dir, "phash.npz"))
+            return self.phash_index
+
+    def update_duplicates(self):
+        """Hashes newly cached images and regroups near-duplicates (background thread)."""
+        phash_index = self.get_phash_index()
+        order = self.store.all_ids()
+        phash_index.build(self.cached_items(order, exclude=phash_index))
+
+        # The earliest id in catalog order leads its group
+        duplicate_of = {}
+        for members in phash_index.groups(order=order):
+            for img_id in members:
+                duplicate_of[img_id] = members[0]
+        self.duplicate_of = duplicate_of
+        return len(set(duplicate_of.values()))
+
+    def get_duplicates(self, img_id):
+        """Other ids showing the same artwork."""
+        canonical = self.duplicate_of.get(img_id)
+        if canonical is None:
+            return []
+        return [i for i, c in self.duplicate_of.items() if c == canonical and i != img_id]
+
+    def collapse_duplicates(self, items):
+        """Keeps only the first of each group of near-duplicates in an {img_id: desc} dict."""
+        if not self.duplicate_of:
+            return items
+        seen = set()
+        collapsed = {}
+        for img_id, desc in items.items():
+            canonical = self.duplicate_of.get(img_id, img_id)
+            if canonical not in seen:
+                seen.add(canonical)
+                collapsed[img_id] = desc
+        return collapsed
+
+    def dedupe_cache_files(self):
+        """Hard-links cached images with identical bytes to one file. Returns bytes reclaimed."""
+        by_digest = {}
+        hashed = []
+        for img_id, digest in self.store.cache_digests().items():
+            if digest is None:
+                # Cached by an older version; hashed once here
+                try:
+                    digest = file_digest(os.path.join(self.cache_dir, f"{img_id}.png"))
+                except OSError:
+                    continue
+                hashed.append((digest, img_id))
+            by_digest.setdefault(digest, []).append(img_id)
+        if hashed:
+            self.store.set_digests(hashed)
+
+        saved = 0
+        for digest, ids in by_digest.items():
+            if len(ids) < 2:
+                continue
+            source = None
+            for img_id in ids:
+                target = os.path.join(self.cache_dir, f"{img_id}.png")
+                try:
+                    if not os.path.exists(target) or (source and os.path.samefile(source, target)):
+                        continue
+                    # Files can be replaced after their digest was recorded, so check the bytes again
+                    if file_digest(target) != digest:
+                        continue
+                    if source is None:
+                        # First id of the group that actually has a cache file
+                        source = target
+                        continue
+                    size = os.path.getsize(target)
+                    tmp_path = f"{target}.link"
+                    os.link(source, tmp_path)
+                    os.replace(tmp_path, target)
+                    saved += size
+                except OSError as e:
+                    print(f"Failed to deduplicate {img_id}: {e}")
+        return saved
+
+    def get_favorites_data(self):
+        """Favorites still in the catalog as {img_id: desc}, in the order they were added."""
+        return self.store.describe(list(self.favorites))
+
+    def migrate_legacy_files(self):
+        """Imports the JSON files and cache directory of older versions into the store (once).
+
+        The JSON files are left in place untouched.
+        """
+        if self.store.get_state("migrated"):
+            return
+        data = self.load_data()
+        if data:
+            self.store.write_catalog(data)
+            meta = self.load_sync_meta()
+            self.store.set_state(etag=meta.get("etag"), last_modified=meta.get("last_modified"))
+        if os.path.exists(self.favorites_file) or os.path.exists(f"{self.favorites_file}.journal"):
+            from favorites_store import read_favorites
+            self.store.import_favorites(read_favorites(self.favorites_file))
+        # Images cached before the store existed; hashed lazily by the indexes that need it
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".png"):
+                st = entry.stat()
+                entries.append((entry.name[:-4], st.st_size, None, st.st_mtime))
+        self.store.record_cached(entries)
+        self.store.set_state(migrated="1")
+
+    def load_sync_meta(self):
+        """Loads the validators of the last successful catalog download (legacy JSON file)."""
+        if os.path.exists(self.sync_meta_file):
+            try:
+                with open(self.sync_meta_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except Exception:
                 pass
         return {}
 
-    def load_favorites(self):
-        """Loads user favorites."""
-        if os.path.exists(self.favorites_file):
+    def apply_sync_diff(self, diff, warm=True):
+        """Purges cached files of ids that left the catalog and queues new ids for warming.
+
+        The very first sync has nothing to compare against, so it doesn't warm the whole catalog.
+        """
+        self.last_sync_diff = diff
+        added = set()
+        removed = set()
+        for changes in diff.values():
+            added.update(changes["added"])
+            removed.update(changes["removed"])
+
+        # An id can move between categories; only purge ids gone from every category
+        gone = {img_id for img_id in removed if img_id not in self.index}
+        for img_id in gone:
+            self.purge_image(img_id)
+        if gone and self.color_index is not None:
+            self.color_index.remove(gone)
+        if gone and self.phash_index is not None:
+            self.phash_index.remove(gone)
+
+        if warm:
+            # Ids that merely moved category are already cached
+            self.queue_warming(sorted(added - removed))
+
+    def queue_warming(self, img_ids):
+        with self.warm_lock:
+            new_ids = [img_id for img_id in img_ids if img_id not in self.queued_for_warming]
+            self.warm_queue.extend(new_ids)
+            self.queued_for_warming.update(new_ids)
+
+    def purge_image(self, img_id):
+        """Deletes the cached image and its thumbnails."""
+        cache_path = os.path.join(self.cache_dir, f"{img_id}.png")
+        try:
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+        except OSError as e:
+            print(f"Failed to purge image {img_id}: {e}")
+        self.forget_cached(img_id)
+        self.thumbnails.purge(img_id)
+
+    def record_cached(self, img_id, cache_path):
+        """Adds a freshly downloaded image to the cache metadata and enforces the budget."""
+        size = os.path.getsize(cache_path)
+        digest = file_digest(cache_path)
+        with self.cache_lock:
+            # Single-flight followers record the same download; count it once
+            if self.store.cache_entry(img_id) is None:
+                self.cache_files += 1
+                self.cache_bytes += size
+            self.store.record_cached([(img_id, size, digest, time.time())])
+        if self.cache_budget and self.cache_bytes > self.cache_budget:
+            self.enforce_budget()
+        self.queue_color_update()
+
+    def forget_cached(self, img_id):
+        with self.cache_lock:
+            entry = self.store.cache_entry(img_id)
+            if entry is None:
+                return
+            self.cache_files -= 1
+            self.cache_bytes -= entry[0]
+            self.store.forget_cached([img_id])
+
+    def enforce_budget(self):
+        """Evicts least recently used images (favorites last) until the cache fits its budget."""
+        if not self.evict_lock.acquire(blocking=False):
+            return 0  # Another thread is already evicting
+        try:
+            target = self.cache_budget * EVICT_TARGET
+            entries = self.store.cache_entries()
+            # Stable sort keeps LRU order within each group
+            entries.sort(key=lambda entry: entry[0] in self.favorites)
+            evicted = 0
+            for img_id, _ in entries:
+                if self.cache_bytes <= target:
+                    break
+                self.purge_image(img_id)
+                evicted += 1
+            self.count("evictions", evicted)
+            return evicted
+        finally:
+            self.evict_lock.release()
+
+    def repair_cache(self):
+        """Drops cache entries whose file is missing, resized or not a complete PNG (background thread).
+
+        Returns how many were repaired; they are downloaded again on next use.
+        """
+        repaired = 0
+        for img_id, size in self.store.cache_entries():
+            cache_path = os.path.join(self.cache_dir, f"{img_id}.png")
             try:
-                with open(self.favorites_file, 'r', encoding='utf-8') as f:
-                    return set(json.load(f))
+                ok = os.path.getsize(cache_path) == size and is_valid_image(cache_path)
+            except OSError:
+                ok = False
+            if not ok:
+                self.purge_image(img_id)
+                repaired += 1
+        self.count("repairs", repaired)
+        return repaired
+
+    def count(self, counter, amount=1):
+        """Bumps a cache counter; called from every loader thread."""
+        with self.cache_lock:
+            self.cache_counters[counter] += amount
+
+    def cache_stats(self):
+        """Snapshot of the image cache from in-memory counters; no disk or database access."""
+        stats = dict(self.cache_counters, files=self.cache_files, bytes=self.cache_bytes,
+                     budget=self.cache_budget)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def start_warming(self):
+        """Downloads and renders queued ids on a low-priority background thread."""
+        with self.warm_lock:
+            if self.warming or self.warm_stopped or not self.warm_queue:
+                return
+            self.warming = True
+        threading.Thread(target=self._warm_worker, daemon=True).start()
+
+    def stop_warming(self):
+        """Drops queued warming work; the image being warmed right now still finishes."""
+        with self.warm_lock:
+            self.warm_stopped = True
+            self.warm_queue.clear()
+            self.queued_for_warming.clear()
+
+    def _warm_worker(self):
+        while True:
+            with self.warm_lock:
+                if not self.warm_queue:
+                    self.warming = False
+                    if not self.warm_stopped:
+                        # Make what was just warmed searchable by colour without waiting for a batch
+                        self.queue_color_update(flush=True)
+                    return
+                img_id = self.warm_queue.popleft()
+                self.queued_for_warming.discard(img_id)
+            try:
+                self.get_thumbnail(img_id)
+            except Exception as e:
+                print(f"Failed to warm image {img_id}: {e}")
+
+    def load_data(self):
+        """Loads the catalog JSON written by older versions, if available."""
+        if os.path.exists(self.data_file):
+            try:
+                with open(self.data_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
             except Exception:
                 pass
-        return set()
+        return {}
 
     def save_favorites(self):
-        """Saves current favorites list."""
-        with open(self.favorites_file, 'w', encoding='utf-8') as f:
-            json.dump(list(self.favorites), f, ensure_ascii=False)
+        """Writes pending favorite toggles and cache bookkeeping now (e.g. on close)."""
+        self.store.flush_favorites()
+        self.store.flush_access()
 
     def toggle_favorite(self, img_id):
-        """Toggles an image's favorite status."""
-        if img_id in self.favorites:
-            self.favorites.remove(img_id)
-            is_fav = False
+        """Toggles an image's favorite status in memory; the store writes it behind."""
+        is_fav = img_id not in self.favorites
+        if is_fav:
+            self.favorites[img_id] = None
         else:
-            self.favorites.add(img_id)
-            is_fav = True
-        self.save_favorites()
+            del self.favorites[img_id]
+        self.store.set_favorite(img_id, is_fav)
         return is_fav
 
     def is_favorite(self, img_id):
@@ -98,17 +639,76 @@ class DataManager:
     def get_image_path(self, img_id):
         """Returns the local path to the image, downloading it if necessary."""
         cache_path = os.path.join(self.cache_dir, f"{img_id}.png")
-        if os.path.exists(cache_path):
+        if self.store.cache_entry(img_id) is not None:
+            self.store.touch(img_id)
+            self.count("hits")
             return cache_path
-            
-        try:
-            url = f"https://raz1ner.com/images/Background-Color/{img_id}-2x.png"
-            response = requests.get(url, stream=True, timeout=10)
-            if response.status_code == 200:
-                with open(cache_path, 'wb') as f:
-                    for chunk in response.iter_content(1024):
-                        f.write(chunk)
-                return cache_path
-        except Exception as e:
-            print(f"Error downloading image {img_id}: {e}")
+        self.count("misses")
+
+        # A stray file without metadata may be a truncated download from an older version
+        if os.path.exists(cache_path) and not is_valid_image(cache_path):
+            os.remove(cache_path)
+        if not os.path.exists(cache_path):
+            url = self.image_url.format(img_id=img_id)
+            if not self.downloader.fetch_to_file(img_id, url, cache_path, validate=is_valid_image):
+                return None
+        self.record_cached(img_id, cache_path)
+        return cache_path
+
+    def bundle_entry(self, img_id):
+        """BundleEntry of img_id in the first bundle holding it, or None."""
+        for bundle in self.bundles:
+            if img_id in bundle:
+                return bundle.entry(img_id)
         return None
+
+    def get_image_source(self, img_id):
+        """Bundled entry if img_id ships in a bundle, else the cached (or downloaded) file path.
+
+        Both are accepted by the thumbnail, preview, colour and phash code.
+        """
+        entry = self.bundle_entry(img_id)
+        if entry is not None:
+            self.count("bundle_hits")
+            return entry
+        return self.get_image_path(img_id)
+
+    def get_image_bytes(self, img_id):
+        """Encoded image bytes: a zero-copy memoryview for bundled images, else the file read."""
+        for bundle in self.bundles:
+            data = bundle.read(img_id)
+            if data is not None:
+                self.count("bundle_hits")
+                return data
+        img_path = self.get_image_path(img_id)
+        if not img_path:
+            return None
+        with open(img_path, 'rb') as f:
+            return f.read()
+
+    def prefetch_images(self, img_ids):
+        """Hints the OS to read a category's bundled images ahead in one sequential pass."""
+        for bundle in self.bundles:
+            bundle.prefetch(img_ids)
+
+    def is_cached(self, img_id):
+        return self.bundle_entry(img_id) is not None or self.store.cache_entry(img_id) is not None
+
+    def get_thumbnail(self, img_id, size=THUMBNAIL_SIZE, source=None):
+        """Returns a ready-to-display square thumbnail, rendering and persisting it on first use.
+
+        Callers that already resolved the image with get_image_source() pass it as `source`.
+        """
+        img_path = source or self.get_image_source(img_id)
+        if not img_path:
+            return None
+        try:
+            return self.thumbnails.get(img_id, img_path, size)
+        except OSError:
+            if not isinstance(img_path, str):
+                raise  # Bundles are read-only; nothing to repair
+            # Missing (cache cleared by hand) or undecodable file: drop it and fetch it again
+            self.purge_image(img_id)
+            self.count("repairs")
+            img_path = self.get_image_path(img_id)
+            return self.thumbnails.get(img_id, img_path, size) if img_path else None
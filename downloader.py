@@ -0,0 +1,114 @@
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import Future
+from metrics import METRICS
+
+# Matches the image loading pool so every worker can hold a keep-alive connection
+DOWNLOAD_WORKERS = 8
+CHUNK_SIZE = 64 * 1024
+
+
+def file_digest(path):
+    """Content digest of a cached file."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Downloader:
+    """Pooled keep-alive HTTP session with single-flight downloads keyed by image id."""
+
+    def __init__(self, workers=DOWNLOAD_WORKERS, timeout=10):
+        self.timeout = timeout
+        self.workers = workers
+        # Created on first request so `requests` stays out of startup
+        self._session = None
+
+        self.lock = threading.Lock()
+        self.in_flight = {}  # key -> Future shared by every caller asking for the same key
+
+    @property
+    def session(self):
+        with self.lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.workers)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def get(self, url, **kwargs):
+        """Plain GET through the pooled session."""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def fetch_to_file(self, key, url, dest_path, validate=None):
+        """Downloads `url` into `dest_path`; concurrent calls for the same key share one download.
+
+        `validate(path)` is checked on the finished side file before it is moved into place.
+        Returns `dest_path` on success or None on failure.
+        """
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+
+        if not leader:
+            return future.result()
+
+        result = None
+        try:
+            # Another leader may have finished between the caller's cache check and ours
+            result = dest_path if os.path.exists(dest_path) else self._download(url, dest_path, validate)
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_result(result)
+        return result
+
+    def _download(self, url, dest_path, validate=None):
+        # Stream into a side file so readers never see a partially written image
+        tmp_path = f"{dest_path}.{threading.get_ident()}.part"
+        started = time.perf_counter()
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    print(f"Error downloading {url}: HTTP {response.status_code}")
+                    METRICS.incr("download.errors")
+                    return None
+                written = 0
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        written += len(chunk)
+                # Content-Length counts encoded bytes, so it can only be checked for identity bodies
+                expected = response.headers.get("Content-Length")
+                if expected and not response.headers.get("Content-Encoding") and int(expected) != written:
+                    print(f"Error downloading {url}: got {written} of {expected} bytes")
+                    METRICS.incr("download.errors")
+                    return None
+            if validate is not None and not validate(tmp_path):
+                print(f"Error downloading {url}: invalid file")
+                METRICS.incr("download.errors")
+                return None
+            os.replace(tmp_path, dest_path)
+            METRICS.observe("download.ms", (time.perf_counter() - started) * 1000)
+            METRICS.incr("download.count")
+            METRICS.incr("download.bytes", written)
+            return dest_path
+        except Exception as e:
+            print(f"Error downloading {url}: {e}")
+            METRICS.incr("download.errors")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
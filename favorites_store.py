@@ -0,0 +1,37 @@
+import os
+import json
+
+
+def replay_journal(journal_path, favorites):
+    """Applies journal toggles to `favorites` in place; returns how many entries were read."""
+    entries = 0
+    if os.path.exists(journal_path):
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    op, img_id = json.loads(line)
+                except ValueError:
+                    continue  # Torn final line from a crash mid-append
+                if op == "+":
+                    favorites[img_id] = None
+                else:
+                    favorites.pop(img_id, None)
+                entries += 1
+    return entries
+
+
+def read_favorites(path):
+    """Reads the favorites of older versions: the snapshot (or its backup, if the snapshot is
+    unreadable) plus the replayed `<path>.journal`. Nothing on disk is changed."""
+    favorites = {}
+    for snapshot in (path, f"{path}.bak"):
+        if not os.path.exists(snapshot):
+            continue
+        try:
+            with open(snapshot, 'r', encoding='utf-8') as f:
+                favorites = dict.fromkeys(json.load(f))
+            break
+        except Exception as e:
+            print(f"Failed to read favorites from {snapshot}: {e}")
+    replay_journal(f"{path}.journal", favorites)
+    return list(favorites)
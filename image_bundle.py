@@ -0,0 +1,142 @@
+import io
+import os
+import json
+import mmap
+import glob
+import struct
+import hashlib
+import threading
+from collections import namedtuple
+
+BUNDLE_MAGIC = b"BGBUNDL1"
+# index offset, index length, magic; the index is located from the end of the file
+TRAILER = struct.Struct("<QQ8s")
+BUNDLE_SUFFIX = ".bgb"
+PAGE_SIZE = mmap.PAGESIZE
+
+_open_bundles = {}
+_open_lock = threading.Lock()
+
+
+class BundleEntry(namedtuple("BundleEntry", "path offset length digest")):
+    """Picklable reference to one image inside a bundle; usable wherever an image path is."""
+
+    def stream(self):
+        return io.BytesIO(open_bundle(self.path).view(self.offset, self.length))
+
+
+def open_image(source):
+    """Opens a PIL image from a file path or a BundleEntry."""
+    from PIL import Image
+    return Image.open(source.stream() if isinstance(source, BundleEntry) else source)
+
+
+def read_source(source):
+    if isinstance(source, BundleEntry):
+        return bytes(open_bundle(source.path).view(source.offset, source.length))
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def open_bundle(path):
+    """Shared ImageBundle per path (per process, so thumbnail workers map it once too)."""
+    with _open_lock:
+        bundle = _open_bundles.get(path)
+        if bundle is None:
+            bundle = _open_bundles[path] = ImageBundle(path)
+        return bundle
+
+
+def load_bundles(directory):
+    """Every readable bundle in `directory`, newest file name first."""
+    bundles = []
+    for path in sorted(glob.glob(os.path.join(directory, f"*{BUNDLE_SUFFIX}")), reverse=True):
+        try:
+            bundles.append(open_bundle(path))
+        except Exception as e:
+            print(f"Failed to open image bundle {path}: {e}")
+    return bundles
+
+
+def write_bundle(path, items, meta=None):
+    """Packs (img_id, source) pairs into a bundle at `path`, in the order given.
+
+    Callers pass ids grouped by category in catalog order, so a category occupies one
+    contiguous range. Returns the number of images written.
+    """
+    entries = {}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(BUNDLE_MAGIC)
+        for img_id, source in items:
+            if img_id in entries:
+                continue
+            try:
+                data = read_source(source)
+            except OSError as e:
+                print(f"Skipping {img_id} in bundle: {e}")
+                continue
+            entries[img_id] = [f.tell(), len(data), hashlib.blake2b(data, digest_size=16).hexdigest()]
+            f.write(data)
+        index = json.dumps({"version": 1, "meta": meta or {}, "entries": entries},
+                           ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+        index_offset = f.tell()
+        f.write(index)
+        f.write(TRAILER.pack(index_offset, len(index), BUNDLE_MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+class ImageBundle:
+    """Read-only pack of encoded images with an id -> (offset, length, digest) index, mapped
+    with mmap so lookups return views into the page cache instead of opening files."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < len(BUNDLE_MAGIC) + TRAILER.size or self.mm[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            raise ValueError("not an image bundle")
+        index_offset, index_length, magic = TRAILER.unpack(self.mm[-TRAILER.size:])
+        if magic != BUNDLE_MAGIC:
+            raise ValueError("truncated image bundle")
+        index = json.loads(self.mm[index_offset:index_offset + index_length])
+        self.meta = index.get("meta", {})
+        self.entries = {img_id: tuple(entry) for img_id, entry in index["entries"].items()}
+
+    def __contains__(self, img_id):
+        return img_id in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def entry(self, img_id):
+        entry = self.entries.get(img_id)
+        return BundleEntry(self.path, *entry) if entry is not None else None
+
+    def view(self, offset, length):
+        """Zero-copy memoryview of a byte range."""
+        return memoryview(self.mm)[offset:offset + length]
+
+    def read(self, img_id):
+        entry = self.entries.get(img_id)
+        return self.view(entry[0], entry[1]) if entry is not None else None
+
+    def prefetch(self, img_ids):
+        """Starts one sequential read-ahead over the range holding these ids (e.g. a category)."""
+        spans = [self.entries[i] for i in img_ids if i in self.entries]
+        if not spans:
+            return
+        start = min(offset for offset, _, _ in spans) // PAGE_SIZE * PAGE_SIZE
+        end = max(offset + length for offset, length, _ in spans)
+        if hasattr(self.mm, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+            self.mm.madvise(mmap.MADV_WILLNEED, start, end - start)
+        else:
+            # No madvise (Windows): fault the pages in from a background thread instead
+            threading.Thread(target=self._touch, args=(start, end), daemon=True).start()
+
+    def _touch(self, start, end):
+        for pos in range(start, end, PAGE_SIZE):
+            self.mm[pos]
@@ -1,8 +1,19 @@
+import time
+# Taken before the heavy imports below so time-to-first-paint covers them
+STARTED = time.perf_counter()
+
 import customtkinter as ctk
+import re
 import threading
+import multiprocessing
 from data_manager import DataManager
+from metrics import METRICS, configure_from_env
 from ui.sidebar import Sidebar
 from ui.image_grid import ImageGrid
+from ui.lag_probe import LagProbe
+from ui.dispatcher import DISPATCHER
+
+HEX_COLOR = re.compile(r"^#(?:[0-9a-fA-F]{3}|[0-9a-fA-F]{6})$")
 
 # Set system appearance
 ctk.set_appearance_mode("System")
@@ -13,6 +24,9 @@ class App(ctk.CTk):
         super().__init__()
         self.title("彩色背景提取工具 (Background Color Viewer)")
         self.geometry("1100x750")
+
+        # Background threads hand their results to the Tk thread through this queue
+        DISPATCHER.attach(self)
         
         # Setting icon if needed (can be a standard .ico file later)
         # self.iconbitmap("app_icon.ico")
@@ -24,9 +38,16 @@ class App(ctk.CTk):
         
         # Initialize Data Manager
         self.data_manager = DataManager()
+
+        # Event-loop lag probe; only runs when metrics are enabled
+        self.lag_probe = LagProbe(self)
+        if METRICS.enabled:
+            self.lag_probe.start()
         
         # Build Sidebar
-        self.sidebar = Sidebar(self, self.data_manager, self.on_category_select)
+        self.current_category = None
+        self.collapse_duplicates = False
+        self.sidebar = Sidebar(self, self.data_manager, self.on_category_select, self.on_search, self.on_collapse_toggle)
         self.sidebar.grid(row=0, column=0, sticky="nsew")
         
         # Build Main Frame
@@ -36,24 +57,45 @@ class App(ctk.CTk):
         self.main_frame.grid_columnconfigure(0, weight=1)
         
         # Build Image Grid
-        self.grid_frame = ImageGrid(self.main_frame, self.data_manager)
+        self.grid_frame = ImageGrid(self.main_frame, self.data_manager, on_find_similar=self.on_find_similar)
         self.grid_frame.grid(row=0, column=0, sticky="nsew")
         
-        # Loading State Indicator
-        self.loading_label = ctk.CTkLabel(self.main_frame, text="正在拉取并同步最新数据...", font=ctk.CTkFont(size=18))
-        self.loading_label.grid(row=0, column=0)
+        # Stale-while-revalidate: show the cached catalog right away and sync behind it
+        self.first_paint_ms = None
+        self.loading_label = None
+        self.data_shown = False
+        # Identifies the latest background colour query; older results are dropped
+        self.query_token = None
+        if self.data_manager.data:
+            self.on_data_ready(True)
+        else:
+            # Loading State Indicator
+            self.loading_label = ctk.CTkLabel(self.main_frame, text="正在拉取并同步最新数据...", font=ctk.CTkFont(size=18))
+            self.loading_label.grid(row=0, column=0)
         
         # Start data fetch
         threading.Thread(target=self.init_data, daemon=True).start()
 
     def init_data(self):
         """Fetches data from website in background and updates UI"""
-        success = self.data_manager.fetch_latest_data()
-        self.after(0, self.on_data_ready, success)
+        # Categories are shown one by one while the rest of the catalog is still downloading
+        success = self.data_manager.fetch_latest_data(
+            on_category=lambda category: DISPATCHER.post(self.on_category_synced, category))
+        DISPATCHER.post(self.on_sync_done, success)
+        # Search index over the synced catalog, built here rather than on the first keystroke
+        self.data_manager.build_search_index()
+        # Drop truncated or missing cache entries before anything indexes them
+        self.data_manager.repair_cache()
+        # Pre-render images that the sync just added to the catalog
+        self.data_manager.start_warming()
+        # Colour features and duplicate detection for images cached since the last run
+        self.data_manager.update_color_index()
+        if self.data_manager.update_duplicates():
+            self.data_manager.dedupe_cache_files()
 
     def on_data_ready(self, success):
         # Remove loading label
-        if self.loading_label.winfo_exists():
+        if self.loading_label is not None and self.loading_label.winfo_exists():
             self.loading_label.destroy()
             
         if not success and not self.data_manager.data:
@@ -61,6 +103,7 @@ class App(ctk.CTk):
             error_lbl.grid(row=0, column=0)
             return
             
+        self.data_shown = True
         # Initialize Sidebar with categories
         categories = list(self.data_manager.data.keys())
         first_cat = categories[0] if categories else None
@@ -69,24 +112,121 @@ class App(ctk.CTk):
         # Default load the first category
         if first_cat:
             self.on_category_select(first_cat)
+        # Runs once the first frame has been drawn
+        self.after_idle(self.report_first_paint)
+
+    def report_first_paint(self):
+        if self.first_paint_ms is None:
+            self.first_paint_ms = (time.perf_counter() - STARTED) * 1000
+            METRICS.observe("ui.first_paint_ms", self.first_paint_ms)
+
+    def on_category_synced(self, category):
+        """A category finished streaming in: show it without waiting for the rest of the sync."""
+        if not self.data_shown:
+            # Nothing was cached, so the first received category is the first render
+            self.on_data_ready(True)
+            return
+        self.sidebar.update_categories(list(self.data_manager.data.keys()), self.current_category)
+        searching = bool(self.sidebar.search_var.get().strip())
+        if category == self.current_category and not searching:
+            cat_data, title = self.category_view(category)
+            self.grid_frame.update_items(cat_data)
+            self.title(title)
+
+    def on_sync_done(self, success):
+        """Applies the background catalog sync to what is already on screen."""
+        if not self.data_shown:
+            # Nothing cached and nothing received
+            self.on_data_ready(success)
+            return
+        diff = self.data_manager.last_sync_diff
+        if not success or not diff:
+            return
+        categories = list(self.data_manager.data.keys())
+        if self.current_category not in ("favorites", *categories):
+            # The category on screen no longer exists
+            self.current_category = categories[0] if categories else None
+            self.sidebar.render_categories(categories, current_category=self.current_category)
+            if self.current_category:
+                self.on_category_select(self.current_category)
+            return
+        self.sidebar.update_categories(categories, self.current_category)
+        searching = bool(self.sidebar.search_var.get().strip())
+        if not searching and (self.current_category == "favorites" or self.current_category in diff):
+            cat_data, title = self.category_view(self.current_category)
+            self.grid_frame.update_items(cat_data)
+            self.title(title)
+
+    def category_view(self, category):
+        """Returns the {img_id: desc} shown for a category and the matching window title."""
+        if category == "favorites":
+            # Materialized from the reverse index in favorite-insertion order
+            fav_data = self.data_manager.get_favorites_data()
+            return fav_data, f"彩色背景提取工具 - 我的收藏 ({len(fav_data)}张)"
+        cat_data = self.data_manager.data.get(category, {})
+        if self.collapse_duplicates:
+            cat_data = self.data_manager.collapse_duplicates(cat_data)
+        cat_name = self.data_manager.get_category_name(category)
+        return cat_data, f"彩色背景提取工具 - {cat_name} ({len(cat_data)}张)"
 
     def on_category_select(self, category):
         """Callback to handle category selection from sidebar"""
-        if category == "favorites":
-            # Collect favorites from all categories by iterating through existing data
-            fav_data = {}
-            for cat, items in self.data_manager.data.items():
-                for img_id, desc in items.items():
-                    if self.data_manager.is_favorite(img_id):
-                        fav_data[img_id] = desc
-            self.grid_frame.render_data(fav_data, showing_favorites=True)
-            self.title(f"彩色背景提取工具 - 我的收藏 ({len(fav_data)}张)")
-        else:
-            cat_data = self.data_manager.data.get(category, {})
-            self.grid_frame.render_data(cat_data, showing_favorites=False)
-            cat_name = self.data_manager.get_category_name(category)
-            self.title(f"彩色背景提取工具 - {cat_name} ({len(cat_data)}张)")
+        self.current_category = category
+        self.query_token = None
+        cat_data, title = self.category_view(category)
+        # Bundled categories are contiguous, so this is one sequential read-ahead
+        self.data_manager.prefetch_images(cat_data)
+        self.grid_frame.render_data(cat_data, showing_favorites=category == "favorites")
+        self.title(title)
+
+    def on_collapse_toggle(self, enabled):
+        self.collapse_duplicates = enabled
+        if self.current_category:
+            self.on_category_select(self.current_category)
+
+    def on_search(self, query):
+        """Shows search results as the user types; an empty query restores the category."""
+        if not query.strip():
+            if self.current_category:
+                self.on_category_select(self.current_category)
+            return
+        query = query.strip()
+        if HEX_COLOR.match(query):
+            # "#rrggbb" searches by colour instead of description
+            self.run_color_query(lambda: self.data_manager.find_similar_colors(query),
+                                 f"彩色背景提取工具 - 搜索 \"{query}\" ({{}}张)")
+            return
+        self.query_token = None
+        results = self.data_manager.search(query)
+        self.show_results(results, f"彩色背景提取工具 - 搜索 \"{query}\" ({len(results)}张)")
+
+    def on_find_similar(self, img_id):
+        """Right-click "find similar colours" on a card."""
+        self.run_color_query(lambda: self.data_manager.find_similar_to(img_id),
+                             f"彩色背景提取工具 - 与 {img_id} 颜色相似 ({{}}张)")
+
+    def run_color_query(self, query, title):
+        """Runs a colour query on a worker: the first one loads NumPy and the feature file, and an
+        unindexed image is decoded and indexed. Only the latest query's results are shown."""
+        token = self.query_token = object()
+
+        def work():
+            try:
+                results = query()
+            except Exception as e:
+                print(f"Colour search failed: {e}")
+                return
+            DISPATCHER.post(self.show_results, results, title.format(len(results)), key="color-query",
+                            stale=lambda: self.query_token is not token)
+        threading.Thread(target=work, daemon=True).start()
+
+    def show_results(self, results, title):
+        self.grid_frame.render_data(results, showing_favorites=False)
+        self.title(title)
 
 if __name__ == "__main__":
+    # Needed by the thumbnail process pool in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
+    configure_from_env()
     app = App()
     app.mainloop()
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import bisect
+import atexit
+import threading
+from collections import deque
+
+# Histogram bucket upper bounds; p50/p95 are reported at this resolution
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+RECENT_SPANS = 200
+
+# Environment switches read by configure_from_env()
+ENV_ENABLE = "BGVIEWER_METRICS"
+ENV_LOG = "BGVIEWER_METRICS_LOG"
+ENV_INTERVAL = "BGVIEWER_METRICS_INTERVAL"
+
+
+class Histogram:
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th sample (the max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3),
+            "min": round(self.min, 3),
+            "max": round(self.max, 3),
+            "p50": round(self.quantile(0.5), 3),
+            "p95": round(self.quantile(0.95), 3),
+        }
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.started) * 1000
+        self.metrics.observe(self.name, ms)
+        self.metrics.recent.append((self.name, threading.current_thread().name, round(ms, 3)))
+        return False
+
+
+class Metrics:
+    """Process-wide counters, histograms and gauges with a JSON snapshot.
+
+    Disabled by default: every recording call returns after one attribute check, and
+    span() hands out a shared no-op context, so the hooks can stay in hot paths.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}  # name -> callable evaluated at snapshot time
+        self.recent = deque(maxlen=RECENT_SPANS)  # (name, thread, ms) of the latest spans
+        self.started = time.time()
+        self.log_thread = None
+
+    def incr(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(value)
+
+    def span(self, name):
+        """Context manager timing a block into the `name` histogram (milliseconds)."""
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+
+    def gauge(self, name, fn):
+        """Registers fn() to be sampled into every snapshot."""
+        self.gauges[name] = fn
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "uptime_s": round(time.time() - self.started, 1),
+                "counters": dict(self.counters),
+                "histograms": {name: h.summary() for name, h in self.histograms.items()},
+                "recent_spans": list(self.recent)[-20:],
+            }
+        gauges = {}
+        for name, fn in list(self.gauges.items()):
+            try:
+                gauges[name] = fn()
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        snapshot["gauges"] = gauges
+        return snapshot
+
+    def dump(self, path):
+        """Writes the current snapshot as JSON."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+    def start_log(self, path, interval=10.0):
+        """Appends a JSON snapshot line to `path` every `interval` seconds and once at exit."""
+        def write():
+            try:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(self.snapshot(), ensure_ascii=False, default=str) + "\n")
+            except Exception as e:
+                print(f"Failed to write metrics log: {e}")
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                write()
+
+        if self.log_thread is None:
+            self.log_thread = threading.Thread(target=loop, name="metrics-log", daemon=True)
+            self.log_thread.start()
+            atexit.register(write)
+
+
+METRICS = Metrics()
+
+
+def configure_from_env():
+    """Enables metrics when BGVIEWER_METRICS is set.
+
+    With BGVIEWER_METRICS_LOG a snapshot line is appended to that file periodically,
+    otherwise one snapshot is written to metrics.json at exit.
+    """
+    if os.environ.get(ENV_ENABLE, "0") in ("", "0"):
+        return METRICS
+    METRICS.enabled = True
+    log_path = os.environ.get(ENV_LOG)
+    if log_path:
+        METRICS.start_log(log_path, float(os.environ.get(ENV_INTERVAL, "10")))
+    else:
+        atexit.register(METRICS.dump, "metrics.json")
+    return METRICS
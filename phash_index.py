@@ -0,0 +1,147 @@
+import os
+import threading
+from collections import defaultdict
+import numpy as np
+from PIL import Image
+from downloader import file_digest
+from image_bundle import BundleEntry, open_image
+
+# Max differing bits (out of 64) for two images to count as near-duplicates.
+# Must stay below BANDS so the band lookup below can't miss a match.
+MAX_DISTANCE = 3
+BANDS = 4
+BAND_BITS = 64 // BANDS
+# dHash only sees structure (every flat colour hashes to 0), so duplicates must also
+# agree on mean colour within this many levels per channel
+MAX_COLOR_DELTA = 2
+
+
+def fingerprint(path):
+    """64-bit difference hash of a 9x8 greyscale thumbnail, plus the image's mean colour."""
+    with open_image(path) as img:
+        rgb = img.convert("RGB").resize((9, 8), Image.BOX)
+    pixels = np.asarray(rgb.convert("L"), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    mean = tuple(int(c) for c in np.asarray(rgb, dtype=np.float32).reshape(-1, 3).mean(axis=0).round())
+    return int(np.packbits(bits).view(">u8")[0]), mean
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class PHashIndex:
+    """Perceptual hashes of cached images with a multi-index (banded) Hamming lookup."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.hashes = {}   # img_id -> 64-bit dHash
+        self.colors = {}   # img_id -> mean (r, g, b)
+        self.digests = {}  # img_id -> content digest of the cached file
+        self.bands = [defaultdict(set) for _ in range(BANDS)]
+        self.load()
+
+    def __contains__(self, img_id):
+        return img_id in self.hashes
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as arrays:
+                for img_id, value, color, digest in zip(arrays["ids"], arrays["hashes"],
+                                                        arrays["colors"], arrays["digests"]):
+                    self._insert(str(img_id), int(value), tuple(int(c) for c in color), str(digest))
+        except Exception as e:
+            print(f"Failed to load perceptual hashes: {e}")
+
+    def save(self):
+        with self.lock:
+            ids = list(self.hashes)
+            arrays = dict(ids=np.array(ids, dtype=str),
+                          hashes=np.array([self.hashes[i] for i in ids], dtype=np.uint64),
+                          colors=np.array([self.colors[i] for i in ids], dtype=np.uint8).reshape(-1, 3),
+                          digests=np.array([self.digests[i] for i in ids], dtype=str))
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.path)
+
+    def _band_keys(self, value):
+        mask = (1 << BAND_BITS) - 1
+        return [(value >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+    def _insert(self, img_id, value, color, digest):
+        self.hashes[img_id] = value
+        self.colors[img_id] = color
+        self.digests[img_id] = digest
+        for band, key in zip(self.bands, self._band_keys(value)):
+            band[key].add(img_id)
+
+    def build(self, items):
+        """Hashes (img_id, path) pairs not yet indexed. Returns how many were added."""
+        added = 0
+        for img_id, path in items:
+            if img_id in self.hashes:
+                continue
+            try:
+                digest = path.digest if isinstance(path, BundleEntry) else file_digest(path)
+                value, color = fingerprint(path)
+            except Exception as e:
+                print(f"Failed to hash {img_id}: {e}")
+                continue
+            with self.lock:
+                self._insert(img_id, value, color, digest)
+            added += 1
+        if added:
+            self.save()
+        return added
+
+    def remove(self, img_ids):
+        with self.lock:
+            removed = False
+            for img_id in img_ids:
+                value = self.hashes.pop(img_id, None)
+                if value is None:
+                    continue
+                self.digests.pop(img_id, None)
+                self.colors.pop(img_id, None)
+                for band, key in zip(self.bands, self._band_keys(value)):
+                    band[key].discard(img_id)
+                    if not band[key]:
+                        del band[key]
+                removed = True
+        if removed:
+            self.save()
+
+    def near(self, img_id, max_distance=MAX_DISTANCE):
+        """Ids within `max_distance` bits of img_id (excluding itself)."""
+        with self.lock:
+            value = self.hashes.get(img_id)
+            if value is None:
+                return []
+            candidates = set()
+            for band, key in zip(self.bands, self._band_keys(value)):
+                candidates |= band.get(key, set())
+            candidates.discard(img_id)
+            color = self.colors[img_id]
+            return [c for c in candidates
+                    if hamming(value, self.hashes[c]) <= max_distance
+                    and max(abs(a - b) for a, b in zip(color, self.colors[c])) <= MAX_COLOR_DELTA]
+
+    def groups(self, order=None, max_distance=MAX_DISTANCE):
+        """Groups (size > 1) of near-duplicates, each led by its first id in `order`.
+
+        Ids only join a leader they are directly near to; tolerance is not chained
+        transitively, which would merge gradual colour ramps into one group.
+        """
+        assigned = set()
+        groups = []
+        for img_id in (order if order is not None else list(self.hashes)):
+            if img_id in assigned or img_id not in self.hashes:
+                continue
+            members = [img_id] + [other for other in self.near(img_id, max_distance) if other not in assigned]
+            assigned.update(members)
+            if len(members) > 1:
+                groups.append(members)
+        return groups
@@ -0,0 +1,158 @@
+"""Headless cache warmer: downloads catalog images into cache/ without starting the UI.
+
+    python prefetch.py                          # every category
+    python prefetch.py gradient pureColor       # selected categories
+    python prefetch.py --thumbnails -j 16       # also pre-render card thumbnails
+    python prefetch.py --base-url http://127.0.0.1:8000 --root build/cache-image
+    python prefetch.py --bundle bundles/catalog.bgb   # also pack them for the installer
+
+Already cached images are skipped, so an interrupted run resumes where it stopped.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from data_manager import DataManager, DEFAULT_BASE_URL
+from image_bundle import write_bundle
+
+
+class Prefetcher:
+    def __init__(self, data_manager, concurrency=8, retries=3, backoff=0.5, thumbnails=False):
+        self.data_manager = data_manager
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.thumbnails = thumbnails
+
+        self.total = 0
+        self.done = 0
+        self.skipped = 0
+        self.failed = []
+        self.bytes = 0
+        self.started = 0.0
+
+    def collect_ids(self, categories=None):
+        """Unique ids of the selected categories, in catalog order."""
+        data = self.data_manager.data
+        selected = categories or list(data.keys())
+        ids = {}
+        for cat in selected:
+            if cat not in data:
+                print(f"Unknown category: {cat}")
+                continue
+            ids.update(dict.fromkeys(data[cat]))
+        return list(ids)
+
+    def fetch_one(self, img_id):
+        """Blocking download (+ optional thumbnail render) run on the executor.
+
+        Returns the cache path, or the BundleEntry of a bundled image.
+        """
+        source = self.data_manager.get_image_source(img_id)
+        if source and self.thumbnails:
+            self.data_manager.get_thumbnail(img_id, source=source)
+        return source
+
+    async def fetch_with_retries(self, loop, executor, semaphore, img_id):
+        async with semaphore:
+            # Already local images only get their thumbnail rendered (with --thumbnails)
+            cached = self.data_manager.is_cached(img_id)
+            if cached and not self.thumbnails:
+                self.skipped += 1
+                self.done += 1
+                return
+            for attempt in range(self.retries + 1):
+                try:
+                    source = await loop.run_in_executor(executor, self.fetch_one, img_id)
+                except Exception as e:
+                    print(f"Error prefetching {img_id}: {e}")
+                    source = None
+                if source:
+                    if cached:
+                        self.skipped += 1
+                    else:
+                        self.bytes += os.path.getsize(source)
+                    self.done += 1
+                    return
+                if attempt < self.retries:
+                    # Exponential backoff with jitter so retries don't arrive in lockstep
+                    await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+            self.failed.append(img_id)
+            self.done += 1
+
+    async def report_progress(self, interval=1.0):
+        while True:
+            await asyncio.sleep(interval)
+            print(self.progress_line(), flush=True)
+
+    def progress_line(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-6)
+        downloaded = self.done - self.skipped - len(self.failed)
+        return (f"[{self.done}/{self.total}] {downloaded} fetched, {self.skipped} cached, "
+                f"{len(self.failed)} failed | {self.bytes / 1048576:.1f} MiB, "
+                f"{self.bytes / 1048576 / elapsed:.2f} MiB/s, {downloaded / elapsed:.1f} img/s")
+
+    async def run(self, ids):
+        self.total = len(ids)
+        self.started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        reporter = asyncio.create_task(self.report_progress())
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                await asyncio.gather(*(
+                    self.fetch_with_retries(loop, executor, semaphore, img_id) for img_id in ids
+                ))
+            finally:
+                reporter.cancel()
+        print(self.progress_line())
+        return not self.failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm the local image cache without opening the UI.")
+    parser.add_argument("categories", nargs="*", help="category keys to prefetch (default: all)")
+    parser.add_argument("-j", "--concurrency", type=int, default=8, help="parallel downloads")
+    parser.add_argument("--retries", type=int, default=3, help="retries per image")
+    parser.add_argument("--backoff", type=float, default=0.5, help="initial retry delay in seconds")
+    parser.add_argument("--thumbnails", action="store_true", help="also render card thumbnails")
+    parser.add_argument("--no-sync", action="store_true", help="use the cached catalog as is")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="server hosting the catalog and images")
+    parser.add_argument("--root", default=".", help="directory holding cache/ and background.db")
+    parser.add_argument("--cache-budget", type=int, default=0,
+                        help="evict least recently used images above this many MiB (default: unbounded)")
+    parser.add_argument("--bundle", metavar="PATH",
+                        help="pack the fetched images into a memory-mapped bundle at PATH")
+    args = parser.parse_args(argv)
+
+    data_manager = DataManager(base_dir=args.root, base_url=args.base_url,
+                               download_workers=args.concurrency,
+                               cache_budget=args.cache_budget * 1024 * 1024)
+    if not args.no_sync and not data_manager.fetch_latest_data() and not data_manager.data:
+        print("No catalog available: sync failed and there is no cached catalog.")
+        return 2
+
+    prefetcher = Prefetcher(data_manager, concurrency=args.concurrency, retries=args.retries,
+                            backoff=args.backoff, thumbnails=args.thumbnails)
+    ids = prefetcher.collect_ids(args.categories)
+    ok = asyncio.run(prefetcher.run(ids))
+    data_manager.thumbnails.flush()
+    if not ok:
+        print(f"Failed ids: {' '.join(prefetcher.failed)}")
+    if args.bundle:
+        # Catalog order keeps each category in one contiguous range of the bundle
+        items = data_manager.cached_items(order=ids)
+        meta = {"etag": data_manager.store.get_state("etag"), "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        os.makedirs(os.path.dirname(os.path.abspath(args.bundle)), exist_ok=True)
+        count = write_bundle(args.bundle, items, meta)
+        print(f"Bundled {count} images into {args.bundle} ({os.path.getsize(args.bundle) / 1048576:.1f} MiB)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,132 @@
+from collections import defaultdict
+
+
+def normalize(text):
+    return str(text).casefold()
+
+
+def ngrams(text):
+    """Unigrams and bigrams of the text; works without word boundaries, so CJK is covered."""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    grams.discard(" ")
+    return grams
+
+
+class SearchIndex:
+    """Inverted n-gram index over background descriptions (and ids)."""
+
+    def __init__(self):
+        self.postings = defaultdict(set)  # gram -> ids
+        self.docs = {}                    # img_id -> normalized text
+        self.order = {}                   # img_id -> catalog position, for stable result order
+        self.next_pos = 0
+        # Previous query and its hits, reused while the user keeps typing
+        self.last_query = ""
+        self.last_hits = []
+
+    def build(self, data):
+        for items in data.values():
+            for img_id, desc in items.items():
+                self.add(img_id, desc)
+
+    def add(self, img_id, desc):
+        self.last_query = ""
+        if img_id in self.docs:
+            self.remove(img_id)
+        text = normalize(f"{desc} {img_id}")
+        self.docs[img_id] = text
+        self.order[img_id] = self.next_pos
+        self.next_pos += 1
+        for gram in ngrams(text):
+            self.postings[gram].add(img_id)
+
+    def remove(self, img_id):
+        self.last_query = ""
+        text = self.docs.pop(img_id, None)
+        if text is None:
+            return
+        del self.order[img_id]
+        for gram in ngrams(text):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(img_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def update(self, diff, data, index):
+        """Applies a catalog sync diff; `index` is the id -> category map after the sync."""
+        for changes in diff.values():
+            for img_id in changes["removed"]:
+                if img_id not in index:
+                    self.remove(img_id)
+        for cat, changes in diff.items():
+            for img_id in changes["added"]:
+                if img_id not in self.docs:
+                    self.add(img_id, data[cat][img_id])
+            # The description changed; add() replaces the old text
+            for img_id in changes.get("changed", ()):
+                self.add(img_id, data[cat][img_id])
+        if any(changes["added"] or changes.get("changed") for changes in diff.values()):
+            # add() appends at the end; put new and moved ids back at their catalog position
+            self.reorder(index)
+
+    def reorder(self, ids):
+        """Renumbers positions (and the docs walk order) to follow `ids`, in catalog order."""
+        ordered = dict.fromkeys(img_id for img_id in ids if img_id in self.docs)
+        ordered.update(dict.fromkeys(self.docs))  # Anything `ids` lacks stays, at the end
+        self.order = {img_id: pos for pos, img_id in enumerate(ordered)}
+        self.docs = {img_id: self.docs[img_id] for img_id in ordered}
+        self.next_pos = len(self.order)
+        self.last_query = ""
+
+    def search(self, query, limit=None):
+        """Ids whose text contains every whitespace-separated term, in catalog order."""
+        normalized = " ".join(normalize(query).split())
+        if not normalized:
+            return []
+        # Typing extends the previous query, so its hits are a superset of the new ones
+        if self.last_query and normalized.startswith(self.last_query):
+            hits = self.filter(self.last_hits, normalized.split(), min_len=1)
+        else:
+            hits = self.lookup(normalized.split())
+        self.last_query, self.last_hits = normalized, hits
+        return hits[:limit] if limit else hits
+
+    def filter(self, ids, terms, min_len=3):
+        """Keeps the ids whose text contains every term of at least `min_len` characters."""
+        docs = self.docs
+        long_terms = [term for term in terms if len(term) >= min_len]
+        if not long_terms:
+            return list(ids)
+        if len(long_terms) == 1:
+            term = long_terms[0]
+            return [img_id for img_id in ids if term in docs[img_id]]
+        return [img_id for img_id in ids if all(term in docs[img_id] for term in long_terms)]
+
+    def lookup(self, terms):
+        candidates = None
+        for term in terms:
+            # Smallest posting lists first keeps the intersection cheap
+            grams = sorted((g for g in ngrams(term) if len(g) == min(2, len(term))),
+                           key=lambda g: len(self.postings.get(g, ())))
+            for gram in grams:
+                ids = self.postings.get(gram)
+                if not ids:
+                    return []
+                if candidates is None:
+                    candidates = ids
+                elif len(candidates) > len(ids):
+                    candidates = ids & candidates
+                else:
+                    candidates = candidates & ids
+                if not candidates:
+                    return []
+
+        if len(candidates) * 4 > len(self.docs):
+            # Broad query: walking the docs in catalog order is cheaper than sorting
+            ordered = [img_id for img_id in self.docs if img_id in candidates]
+        else:
+            ordered = sorted(candidates, key=self.order.__getitem__)
+        # Uni/bigram postings are exact; longer terms need a substring check for adjacency
+        return self.filter(ordered, terms)
@@ -0,0 +1,119 @@
+import os
+import queue
+import atexit
+import threading
+from thumbnail_store import render_variants, THUMBNAIL_SIZES
+
+# Largest thumbnail a slot must hold (RGBA)
+SLOT_BYTES = max(THUMBNAIL_SIZES) ** 2 * 4
+
+# Shared memory block attached once per worker process
+_worker_shm = None
+
+
+def _attach(name):
+    from multiprocessing import shared_memory
+    global _worker_shm
+    if _worker_shm is None or _worker_shm.name != name:
+        try:
+            _worker_shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13: pool workers share the parent's resource tracker, so the
+            # duplicate registration is harmless and the parent still unlinks the block
+            _worker_shm = shared_memory.SharedMemory(name=name)
+    return _worker_shm
+
+
+def _render_job(src_path, paths, size, shm_name, offset):
+    """Runs in a worker process: renders and stores every variant, then copies the
+    requested one's RGBA pixels into its shared memory slot."""
+    thumb = render_variants(src_path, paths)[size]
+    pixels = thumb.tobytes()
+    if len(pixels) > SLOT_BYTES:
+        raise ValueError(f"{thumb.size} thumbnail does not fit a shared memory slot")
+    _attach(shm_name).buf[offset:offset + len(pixels)] = pixels
+    return thumb.mode, thumb.size
+
+
+class ThumbnailEngine:
+    """Process pool for PNG decode + LANCZOS resampling, so thumbnailing isn't bound by the GIL.
+
+    Results come back through a shared memory block split into fixed slots; the pool
+    only pickles paths and a (mode, size) tuple. Callers block while every slot is busy,
+    which also bounds how far the workers can run ahead. The pool and the block are
+    created on the first render, so a fully cached start never pays for them.
+    """
+
+    def __init__(self, workers=None, slots=None):
+        self.workers = workers or os.cpu_count() or 2
+        self.slots = slots or self.workers * 2
+        self.executor = None
+        self.shm = None
+        self.free_slots = queue.Queue()
+        self.start_lock = threading.Lock()
+        self.closed = False
+
+    def start(self):
+        with self.start_lock:
+            if self.executor is not None:
+                return
+            # Imported here: multiprocessing is a noticeable share of startup time
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            from multiprocessing import shared_memory
+            self.shm = shared_memory.SharedMemory(create=True, size=SLOT_BYTES * self.slots)
+            for i in range(self.slots):
+                self.free_slots.put(i)
+            # Spawned, not forked: the parent runs loader, sync and timer threads whose locks
+            # a forked child could inherit mid-acquire
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(self.close)
+
+    def render(self, src_path, paths, size):
+        """Renders and stores all {size: path} variants; returns the `size` one as a PIL image.
+
+        Decode errors from the worker are raised as they are; a broken or shut down pool
+        raises RuntimeError (BrokenProcessPool is one).
+        """
+        if self.closed or size * size * 4 > SLOT_BYTES:
+            # Closed at exit, or larger than a slot (e.g. a custom size), which would overrun
+            # the next slot: render here
+            return render_variants(src_path, paths)[size]
+        self.start()
+        slot = self.free_slots.get()
+        try:
+            offset = slot * SLOT_BYTES
+            try:
+                future = self.executor.submit(_render_job, src_path, paths, size, self.shm.name, offset)
+            except RuntimeError:
+                # Shut down by close() or by the interpreter exiting; it won't come back
+                self.closed = True
+                return render_variants(src_path, paths)[size]
+            from concurrent.futures import CancelledError
+            try:
+                mode, img_size = future.result()
+            except (CancelledError, RuntimeError):
+                if not self.closed:
+                    raise
+                # Shut down while this job was queued or running
+                return render_variants(src_path, paths)[size]
+            nbytes = img_size[0] * img_size[1] * len(mode)
+            from PIL import Image
+            # Wrap the slot in place and take a single copy so the slot can be reused right away
+            view = Image.frombuffer(mode, img_size, self.shm.buf[offset:offset + nbytes], "raw", mode, 0, 1)
+            return view.copy()
+        finally:
+            self.free_slots.put(slot)
+
+    def close(self):
+        self.closed = True
+        if self.shm is None:
+            return
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = None
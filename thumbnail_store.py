@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import atexit
+import shutil
+import hashlib
+import threading
+from metrics import METRICS
+from image_bundle import BundleEntry, open_image
+
+# Bump whenever the rendering below changes so stale thumbnails are discarded
+THUMBNAIL_VERSION = 1
+
+# Card thumbnail size and its HiDPI (2x) variant
+THUMBNAIL_SIZE = 140
+THUMBNAIL_SIZES = (THUMBNAIL_SIZE, THUMBNAIL_SIZE * 2)
+
+
+def render_thumbnail(pil_img, size):
+    """Fits the image into a transparent `size` x `size` square."""
+    from PIL import Image
+    # Same fit as Image.thumbnail (never upscales) but without copying the source first
+    scale = min(size / pil_img.width, size / pil_img.height, 1)
+    new_size = (max(1, round(pil_img.width * scale)), max(1, round(pil_img.height * scale)))
+    thumb = pil_img.resize(new_size, Image.LANCZOS) if new_size != pil_img.size else pil_img
+    square_img = Image.new("RGBA", (size, size), (255, 255, 255, 0))
+    offset = ((size - thumb.width) // 2, (size - thumb.height) // 2)
+    square_img.paste(thumb, offset)
+    return square_img
+
+
+def save_thumbnail(thumb, path):
+    # pid + thread id keeps temp names unique across worker processes and threads
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        thumb.save(tmp_path, format="PNG", compress_level=1)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Failed to store thumbnail {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def render_variants(src_path, paths):
+    """Decodes the source (a path or BundleEntry) once, renders every {size: path} variant and stores it."""
+    thumbs = {}
+    with open_image(src_path) as pil_img:
+        pil_img.load()
+        for size, path in paths.items():
+            thumbs[size] = render_thumbnail(pil_img, size)
+            save_thumbnail(thumbs[size], path)
+    return thumbs
+
+
+class ThumbnailStore:
+    """Persistent tier of ready-to-display thumbnails, keyed by image id and source content hash."""
+
+    def __init__(self, root, engine=None):
+        self.root = root
+        # Optional ThumbnailEngine that renders misses in worker processes
+        self.engine = engine
+        self.dir = os.path.join(root, f"v{THUMBNAIL_VERSION}")
+        self.index_file = os.path.join(self.dir, "index.json")
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_flush = time.monotonic()
+
+        os.makedirs(self.dir, exist_ok=True)
+        self.purge_old_versions()
+        # img_id -> [source size, source mtime_ns, source hash]
+        self.index = self.load_index()
+        atexit.register(self.flush)
+
+    def purge_old_versions(self):
+        """Removes thumbnails rendered by older versions of the pipeline."""
+        current = os.path.basename(self.dir)
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name != current and name.startswith("v") and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def load_index(self):
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception:
+                pass
+        return {}
+
+    def flush(self):
+        """Writes the source hash index if it changed."""
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = json.dumps(self.index, separators=(',', ':'))
+            self.dirty = False
+            self.last_flush = time.monotonic()
+        tmp_path = f"{self.index_file}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.index_file)
+        except Exception as e:
+            print(f"Failed to save thumbnail index: {e}")
+
+    def source_hash(self, img_id, src_path):
+        """Content hash of the source image; only re-hashes when size or mtime changed."""
+        if isinstance(src_path, BundleEntry):
+            return src_path.digest  # Bundles store it in their index
+        st = os.stat(src_path)
+        with self.lock:
+            entry = self.index.get(img_id)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+
+        h = hashlib.blake2b(digest_size=8)
+        with open(src_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self.lock:
+            old = self.index.get(img_id)
+            self.index[img_id] = [st.st_size, st.st_mtime_ns, digest]
+            self.dirty = True
+        if old and old[2] != digest:
+            self.remove_files(img_id)
+        return digest
+
+    def path_for(self, img_id, digest, size):
+        return os.path.join(self.dir, f"{img_id}-{size}-{digest}.png")
+
+    def get(self, img_id, src_path, size=THUMBNAIL_SIZE):
+        """Returns the thumbnail for `img_id`, rendering all variants from the source on a miss."""
+        digest = self.source_hash(img_id, src_path)
+        thumb_path = self.path_for(img_id, digest, size)
+        if os.path.exists(thumb_path):
+            try:
+                from PIL import Image
+                with METRICS.span("thumbnail.load_ms"):
+                    thumb = Image.open(thumb_path)
+                    thumb.load()
+                return thumb
+            except Exception:
+                pass  # Corrupt entry, render it again
+
+        paths = {variant: self.path_for(img_id, digest, variant)
+                 for variant in sorted(set(THUMBNAIL_SIZES + (size,)))}
+        result = None
+        with METRICS.span("thumbnail.render_ms"):
+            if self.engine is not None:
+                try:
+                    result = self.engine.render(src_path, paths, size)
+                except RuntimeError as e:
+                    # Pool broken or shut down; a missing or undecodable source is raised as is
+                    print(f"Thumbnail engine failed, rendering in-process: {e}")
+            if result is None:
+                result = render_variants(src_path, paths)[size]
+
+        if time.monotonic() - self.last_flush > 2:
+            self.flush()
+        return result
+
+    def remove_files(self, img_id):
+        prefix = f"{img_id}-"
+        for name in os.listdir(self.dir):
+            if name.startswith(prefix) and name.endswith(".png"):
+                try:
+                    os.remove(os.path.join(self.dir, name))
+                except OSError:
+                    pass
+
+    def purge(self, img_id):
+        """Drops every stored thumbnail for the image."""
+        with self.lock:
+            entry = self.index.pop(img_id, None)
+            if entry is not None:
+                self.dirty = True
+        if entry is None:
+            self.remove_files(img_id)
+            return
+        # The digest names the files directly, so cache eviction doesn't list the directory
+        for size in THUMBNAIL_SIZES:
+            try:
+                os.remove(self.path_for(img_id, entry[2], size))
+            except OSError:
+                pass
@@ -0,0 +1,88 @@
+import time
+import threading
+from collections import OrderedDict
+from metrics import METRICS
+
+# The queue is drained at most once per frame, for at most BATCH_BUDGET_MS, so input
+# events always get the rest of the frame even while hundreds of results are waiting
+FRAME_MS = 16
+BATCH_BUDGET_MS = 8
+
+
+class UIDispatcher:
+    """Hands results from background threads to the Tk thread in time-capped batches.
+
+    Workers post() a callback instead of calling widget.after() themselves; only the first
+    post into an empty queue schedules a drain, so a burst of results costs one Tk event
+    per frame rather than one per result.
+    """
+
+    def __init__(self, frame_ms=FRAME_MS, budget_ms=BATCH_BUDGET_MS):
+        self.frame_ms = frame_ms
+        self.budget_ms = budget_ms
+        self.widget = None
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()  # key -> (callback, args, stale)
+        self.scheduled = False
+        self.last_drain = 0.0
+        METRICS.gauge("ui.dispatch_pending", self.depth)
+
+    def attach(self, widget):
+        """Binds the dispatcher to the Tk root; called once from the Tk thread."""
+        self.widget = widget
+        with self.lock:
+            waiting = bool(self.pending) and not self.scheduled
+            self.scheduled = self.scheduled or waiting
+        if waiting:
+            self.widget.after(0, self.drain)
+
+    def depth(self):
+        return len(self.pending)
+
+    def post(self, callback, *args, key=None, stale=None):
+        """Queues callback(*args) for the Tk thread (callable from any thread).
+
+        A later post with the same key replaces one still queued; stale() is checked on the
+        Tk thread right before running and drops results nobody is waiting for anymore.
+        """
+        with self.lock:
+            if key is None:
+                key = object()
+            else:
+                self.pending.pop(key, None)
+            self.pending[key] = (callback, args, stale)
+            if self.scheduled or self.widget is None:
+                return
+            self.scheduled = True
+        delay = self.frame_ms - (time.perf_counter() - self.last_drain) * 1000
+        self.widget.after(max(0, int(delay)), self.drain)
+
+    def drain(self):
+        started = time.perf_counter()
+        deadline = started + self.budget_ms / 1000
+        ran = dropped = 0
+        while time.perf_counter() < deadline:
+            with self.lock:
+                if not self.pending:
+                    break
+                _, (callback, args, stale) = self.pending.popitem(last=False)
+            try:
+                if stale is not None and stale():
+                    dropped += 1
+                    continue
+                callback(*args)
+                ran += 1
+            except Exception as e:
+                print(f"UI update failed: {e}")
+        self.last_drain = time.perf_counter()
+        METRICS.observe("ui.dispatch_ms", (self.last_drain - started) * 1000)
+        METRICS.incr("ui.dispatched", ran)
+        METRICS.incr("ui.dispatch_dropped", dropped)
+        with self.lock:
+            self.scheduled = bool(self.pending)
+        if self.scheduled:
+            # Over budget: yield to input and redraw, continue next frame
+            self.widget.after(self.frame_ms, self.drain)
+
+
+DISPATCHER = UIDispatcher()
@@ -0,0 +1,59 @@
+"""Pure layout math for the virtualized image grid.
+
+Everything here works in logical (unscaled) pixels and has no Tk dependency,
+so it can be reasoned about (and measured) without a display.
+"""
+
+CARD_SIZE = 140
+CARD_PADDING = 10
+CELL_SIZE = CARD_SIZE + 2 * CARD_PADDING  # 140 card + 20 padding
+
+# Extra rows kept alive above and below the viewport so short scrolls never show blanks
+OVERSCAN_ROWS = 2
+
+
+def compute_columns(width, cell_size=CELL_SIZE):
+    """Number of card columns that fit into the given width."""
+    return max(1, int(width // cell_size))
+
+
+def row_count(count, columns):
+    return (count + columns - 1) // columns
+
+
+def content_height(count, columns, cell_size=CELL_SIZE):
+    """Total height of the scrollable content for `count` items."""
+    return row_count(count, columns) * cell_size
+
+
+def visible_range(top, height, count, columns, overscan=OVERSCAN_ROWS, cell_size=CELL_SIZE):
+    """Returns the [start, end) item indices that intersect the viewport plus overscan rows."""
+    if count <= 0:
+        return 0, 0
+    first_row = max(0, int(top // cell_size) - overscan)
+    last_row = int((top + max(height, 0)) // cell_size) + overscan
+    last_row = min(last_row, row_count(count, columns) - 1)
+    start = first_row * columns
+    end = min(count, (last_row + 1) * columns)
+    return start, max(start, end)
+
+
+def cell_position(index, columns, width, cell_size=CELL_SIZE, card_size=CARD_SIZE):
+    """Top-left position of the card at `index`, centred within its column slot."""
+    row, col = divmod(index, columns)
+    slot_width = max(width / columns, cell_size)
+    x = int(col * slot_width + (slot_width - card_size) / 2)
+    y = row * cell_size + (cell_size - card_size) // 2
+    return x, y
+
+
+def row_distance(index, columns, top, height, cell_size=CELL_SIZE):
+    """How many rows the item lies outside the viewport; 0 when it is on screen."""
+    row = index // columns
+    first_row = int(top // cell_size)
+    last_row = int((top + max(height, 1) - 1) // cell_size)
+    if row < first_row:
+        return first_row - row
+    if row > last_row:
+        return row - last_row
+    return 0
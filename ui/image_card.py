@@ -1,28 +1,56 @@
 import threading
 import customtkinter as ctk
-from PIL import Image
-import pyperclip
-import os
+from thumbnail_store import THUMBNAIL_SIZE
+from downloader import DOWNLOAD_WORKERS
+from .thumbnail_cache import ThumbnailCache, load_card_thumbnail
+from .load_scheduler import LoadScheduler
+from .preview_cache import PreviewCache
+from .dispatcher import DISPATCHER
+from metrics import METRICS
 import time
-from concurrent.futures import ThreadPoolExecutor
 
-# Global thread pool to limit concurrent image processing and loading
-_thread_pool = ThreadPoolExecutor(max_workers=8)
+# Global viewport-priority scheduler that limits concurrent image processing and loading
+_load_scheduler = LoadScheduler(DOWNLOAD_WORKERS)
+# Bounded memory cache of card thumbnails so re-rendering the same categories is instant
+_thumbnail_cache = ThumbnailCache()
+METRICS.gauge("load_queue.depth", _load_scheduler.pending)
+METRICS.gauge("thumbnail_cache", _thumbnail_cache.stats)
 
 class HoverPreview:
     _instance = None
-    _loading = False
+    _token = None     # Identifies the hover that is currently allowed to show a preview
+    _img_path = None
+    _cache = PreviewCache()
     
     @classmethod
     def show(cls, widget, img_path, x_offset):
-        if cls._loading: return
-        cls._loading = True
+        if cls._token is not None and cls._img_path == img_path:
+            return
+        token = cls._token = object()
+        cls._img_path = img_path
+        ready = {}
+        
+        # Decode starts right away in the background; the delay only prevents flashing
+        # if the mouse moves quickly over things
+        def _on_decoded(pil_img):
+            ready["img"] = pil_img
+            if ready.get("due"):
+                DISPATCHER.post(_show, key=cls)
+        
+        def _due():
+            ready["due"] = True
+            if "img" in ready:
+                _show()
         
-        # Small delay to prevent flashing if mouse moves quickly over things
         def _show():
-            if not cls._loading: return
+            if cls._token is not token or not widget.winfo_exists():
+                return
+            pil_img = ready.get("img")
+            if pil_img is None:
+                return
             if cls._instance:
-                cls.hide()
+                cls._instance.destroy()
+                cls._instance = None
                 
             try:
                 # Need to use standard Toplevel as CTkToplevel has issues with overrideredirect in some OS
@@ -31,10 +59,6 @@ class HoverPreview:
                 cls._instance.overrideredirect(True)
                 cls._instance.attributes("-topmost", True)
                 
-                # Load larger image (cache the PIL image or just load fast from SSD)
-                pil_img = Image.open(img_path)
-                pil_img.thumbnail((360, 360), Image.LANCZOS)
-                
                 # Size calculation
                 w, h = pil_img.width, pil_img.height
                 x = widget.winfo_rootx() + x_offset
@@ -59,34 +83,49 @@ class HoverPreview:
             except Exception as e:
                 print(f"Hover preview error: {e}")
                 cls.hide()
-            finally:
-                cls._loading = False
-                
-        widget.after(300, _show)
+        
+        cls._cache.request(img_path, _on_decoded)
+        widget.after(300, _due)
+
+    @classmethod
+    def prefetch(cls, img_paths):
+        """Prepares previews for cards the pointer is likely to move to next."""
+        cls._cache.prefetch(img_paths)
 
     @classmethod
     def hide(cls):
-        cls._loading = False
+        if cls._img_path is not None and cls._cache.get(cls._img_path) is None:
+            # Pointer left before the preview was decoded
+            cls._cache.cancel(cls._img_path)
+        cls._token = None
+        cls._img_path = None
         if cls._instance:
             cls._instance.destroy()
             cls._instance = None
 
 
 class ImageCard(ctk.CTkFrame):
-    # Memory cache so re-rending same categories is instant
-    _THUMBNAIL_CACHE = {}
+    _THUMBNAIL_CACHE = _thumbnail_cache
 
-    def __init__(self, master, img_id, desc, is_favorite, data_manager, on_favorite_toggle, **kwargs):
+    def __init__(self, master, img_id, desc, is_favorite, data_manager, on_favorite_toggle, on_find_similar=None, on_hover=None, **kwargs):
         super().__init__(master, fg_color=("gray90", "gray15"), corner_radius=8, cursor="hand2", **kwargs)
+        self.on_find_similar = on_find_similar
+        self.on_hover = on_hover
         self.img_id = img_id
         self.desc = desc
         self.is_favorite = is_favorite
         self.data_manager = data_manager
         self.on_favorite_toggle = on_favorite_toggle
         self.img_path = None
+        self.hovered = False
+        self.priority = 0
+        # Bumped on every rebind so stale background loads can be recognized and dropped
+        self.generation = 0
         
         # Compact design
-        self.card_size = 140
+        self.card_size = THUMBNAIL_SIZE
+        # Use the 2x thumbnail on HiDPI displays so CTk doesn't upscale the 1x one
+        self.thumb_size = THUMBNAIL_SIZE * 2 if self._get_widget_scaling() > 1 else THUMBNAIL_SIZE
         self.configure(width=self.card_size, height=self.card_size)
         self.pack_propagate(False)
         self.grid_propagate(False)
@@ -121,21 +160,26 @@ class ImageCard(ctk.CTkFrame):
         self.image_label.bind("<Leave>", self.on_hover_out)
         self.fav_btn.bind("<Enter>", lambda e: HoverPreview.hide()) # Don't hover preview on btn
         
+        # Context menu (right click; Button-2 is the right button on macOS)
+        for seq in ("<Button-3>", "<Button-2>"):
+            self.bind(seq, self.show_menu)
+            self.image_label.bind(seq, self.show_menu)
+        
         # Start loading image
         if self.img_id:
-            if self.img_id in ImageCard._THUMBNAIL_CACHE:
-                self.image_label.configure(image=ImageCard._THUMBNAIL_CACHE[self.img_id], text="")
-                self.img_path = self.data_manager.get_image_path(self.img_id) # Should be fast cache hit
-            else:
-                _thread_pool.submit(self.load_image)
+            self.start_loading()
         else:
              self.image_label.configure(text="")
         
-    def update_data(self, img_id, desc, is_favorite):
+    def update_data(self, img_id, desc, is_favorite, priority=0):
         self.img_id = img_id
         self.desc = desc
         self.is_favorite = is_favorite
         self.img_path = None
+        self.priority = priority
+        # Any load still running for the previous binding is now stale
+        self.generation += 1
+        _load_scheduler.cancel(self)
         
         # Reset UI to loading
         self.image_label.configure(image="", text="Loading...")
@@ -145,50 +189,86 @@ class ImageCard(ctk.CTkFrame):
         
         # Start loading image
         if self.img_id:
-            if self.img_id in ImageCard._THUMBNAIL_CACHE:
-                self.image_label.configure(image=ImageCard._THUMBNAIL_CACHE[self.img_id], text="")
-                self.img_path = self.data_manager.get_image_path(self.img_id) # Should be fast cache hit
-            else:
-                _thread_pool.submit(self.load_image)
+            self.start_loading()
+
+    def start_loading(self):
+        """Shows the cached thumbnail if there is one, otherwise loads it in the background."""
+        ctk_img = ImageCard._THUMBNAIL_CACHE.get(self.img_id)
+        if ctk_img is not None:
+            self.image_label.configure(image=ctk_img, text="")
+            # The source is only needed for the hover preview; resolved on first hover
+        else:
+            _load_scheduler.submit(self, self.load_image, self.img_id, self.generation, time.perf_counter(),
+                                   priority=self.priority)
+            if METRICS.enabled:
+                METRICS.observe("load_queue.depth_at_submit", _load_scheduler.pending())
+
+    def set_priority(self, priority):
+        """Called by the grid as the card moves relative to the viewport."""
+        if priority != self.priority:
+            self.priority = priority
+            _load_scheduler.reprioritize(self, priority)
+
+    def cancel_loading(self):
+        """Drops pending work for this card, e.g. when the grid recycles it."""
+        self.generation += 1
+        _load_scheduler.cancel(self)
         
-    def load_image(self):
+    def load_image(self, img_id, generation, queued_at=None):
         """Loads image file or fetches from URL in background."""
-        self.img_path = self.data_manager.get_image_path(self.img_id)
-        if self.img_path and os.path.exists(self.img_path):
-            try:
-                pil_img = Image.open(self.img_path)
-                # Resize image to fit square
-                pil_img.thumbnail((self.card_size, self.card_size), Image.LANCZOS)
-                
-                # Create a square background image
-                square_img = Image.new("RGBA", (self.card_size, self.card_size), (255, 255, 255, 0))
-                offset = ((self.card_size - pil_img.width) // 2, (self.card_size - pil_img.height) // 2)
-                square_img.paste(pil_img, offset)
-                
-                ctk_img = ctk.CTkImage(light_image=square_img, size=(self.card_size, self.card_size))
-                ImageCard._THUMBNAIL_CACHE[self.img_id] = ctk_img
-                
-                if self.winfo_exists():
-                    self.after(0, self.update_image, ctk_img)
-            except Exception as e:
-                print(f"Failed to process image {self.img_id}: {e}")
-                if self.winfo_exists():
-                    self.after(0, lambda: self.image_label.configure(text="Error"))
+        if generation != self.generation:
+            return
+        if queued_at is not None:
+            METRICS.observe("card.queue_wait_ms", (time.perf_counter() - queued_at) * 1000)
+        with METRICS.span("card.load_ms"):
+            self._load_image(img_id, generation)
+
+    def _load_image(self, img_id, generation):
+        try:
+            ctk_img, img_path = load_card_thumbnail(self.data_manager, ImageCard._THUMBNAIL_CACHE, img_id,
+                                                    self.thumb_size, self.card_size)
+        except Exception as e:
+            print(f"Failed to process image {img_id}: {e}")
+            self.post_result(generation, self.show_error, "Error", generation)
+            return
+        if ctk_img is None:
+            self.post_result(generation, self.show_error, "Error loading", generation)
         else:
-            if self.winfo_exists():
-                self.after(0, lambda: self.image_label.configure(text="Error loading"))
+            self.post_result(generation, self.update_image, ctk_img, generation, img_path)
+
+    def post_result(self, generation, callback, *args):
+        """Hands a load result to the Tk thread; dropped there if the card was recycled by then."""
+        DISPATCHER.post(callback, *args, key=self,
+                        stale=lambda: generation != self.generation or not self.winfo_exists())
 
-    def update_image(self, ctk_img):
-        """Updates the widget image main thread."""
+    def update_image(self, ctk_img, generation, img_path=None):
+        """Updates the widget image main thread, unless the card was rebound meanwhile."""
+        if generation != self.generation:
+            return
+        self.img_path = img_path
         self.image_label.configure(image=ctk_img, text="")
 
+    def show_error(self, text, generation):
+        if generation == self.generation:
+            self.image_label.configure(text=text)
+
     def copy_id(self, event=None):
         """Copies ID to clipboard with visual feedback."""
+        import pyperclip  # Only needed on click; kept out of startup
         pyperclip.copy(self.img_id)
         # Show toast
         self.toast_label.place(relx=0.5, rely=0.5, anchor="center")
         self.after(1000, self.toast_label.place_forget)
 
+    def show_menu(self, event):
+        if not self.img_id or not self.on_find_similar:
+            return
+        HoverPreview.hide()
+        import tkinter as tk
+        menu = tk.Menu(self, tearoff=0)
+        menu.add_command(label="查找相似颜色", command=lambda img_id=self.img_id: self.on_find_similar(img_id))
+        menu.tk_popup(event.x_root, event.y_root)
+
     def toggle_fav(self):
         """Toggles the favorite status."""
         HoverPreview.hide()
@@ -199,8 +279,29 @@ class ImageCard(ctk.CTkFrame):
             self.on_favorite_toggle(self.img_id, self.is_favorite)
 
     def on_hover_in(self, event):
-        if self.img_path and os.path.exists(self.img_path):
-            HoverPreview.show(self, self.img_path, self.card_size + 10)
+        self.hovered = True
+        if self.img_path:
+            self.show_preview()
+        elif self.img_id:
+            # Shown from the memory cache, so the source isn't known yet; look it up off the Tk thread
+            _load_scheduler.submit((self, "source"), self.resolve_source, self.img_id, self.generation)
+
+    def resolve_source(self, img_id, generation):
+        source = self.data_manager.get_image_source(img_id)
+        if source:
+            DISPATCHER.post(self.set_source, source, key=(self, "source"),
+                            stale=lambda: generation != self.generation or not self.winfo_exists())
+
+    def set_source(self, source):
+        self.img_path = source
+        if self.hovered:
+            self.show_preview()
+
+    def show_preview(self):
+        HoverPreview.show(self, self.img_path, self.card_size + 10)
+        if self.on_hover:
+            self.on_hover(self)
 
     def on_hover_out(self, event):
+        self.hovered = False
         HoverPreview.hide()
@@ -1,24 +1,44 @@
+import time
+import tkinter
 import customtkinter as ctk
-from .image_card import ImageCard
+from .image_card import ImageCard, HoverPreview
+from .grid_layout import compute_columns, content_height, visible_range, cell_position, row_distance
+
+# Time slice for applying card moves before yielding back to the event loop
+MOVE_BATCH_MS = 8
 
 class ImageGrid(ctk.CTkScrollableFrame):
-    def __init__(self, master, data_manager, **kwargs):
+    """Virtualized grid: only the cards for the visible rows (plus overscan) exist and
+    they are recycled as the view scrolls, so widget count is independent of category size."""
+
+    def __init__(self, master, data_manager, on_find_similar=None, **kwargs):
         super().__init__(master, **kwargs)
         self.data_manager = data_manager
-        self.pool = []
-        self.active_cards = 0
+        self.on_find_similar = on_find_similar
+        self.pool = []          # Idle cards ready for reuse
+        self.visible = {}       # item index -> card currently bound to it
+        self.placements = {}    # card -> (x, y) it is currently placed at
+        self.pending_moves = {} # card -> (x, y) still to be applied
+        self.move_job = None
+        self.resize_job = None
         self.no_data_lbl = None
-        
-        self.columns = max(1, self.winfo_width() // 160) # 140 card + 20 padding
-        if self.columns == 0: self.columns = 4
-        
+
+        self.columns = compute_columns(self.winfo_width())
+        self.last_width = 0
+
         self.bind("<Configure>", self.on_resize, add="+")
         self.current_data = {}
+        self.items = []
         self.showing_favorites = False
-        
-        # Grid weight config so that it centers
-        for i in range(15):
-            self.grid_columnconfigure(i, weight=1)
+
+        # Invisible spacer that gives the scrollable frame the full virtual content height
+        self.spacer = tkinter.Frame(self, width=0, height=0, highlightthickness=0, borderwidth=0)
+
+        # Hook canvas scrolling so the visible window follows the viewport
+        self._parent_canvas.configure(yscrollcommand=self.on_scroll)
+
+        # Lets the empty-state label centre itself
+        self.grid_columnconfigure(0, weight=1)
 
     def render_data(self, image_data, showing_favorites=False):
         """Renders the grid of images."""
@@ -26,76 +46,182 @@ class ImageGrid(ctk.CTkScrollableFrame):
         self.showing_favorites = showing_favorites
         self.refresh_grid()
 
+    def update_items(self, image_data):
+        """Swaps in fresh data for the current view (e.g. after a background sync) without
+        resetting the scroll position. Cards follow their item to its new index, so only
+        items that are new to the window get bound."""
+        old_count = len(self.items)
+        self.current_data = image_data
+        self.items = list(image_data.items())
+        if not self.items or not old_count:
+            self.refresh_grid()
+            return
+        shown = {card.img_id for card in self.visible.values()}
+        new_index = {item: i for i, item in enumerate(self.items) if item[0] in shown}
+        kept = {}
+        for index, card in list(self.visible.items()):
+            moved_to = new_index.get((card.img_id, card.desc))
+            if moved_to is None or moved_to in kept:
+                self.recycle(index)
+            else:
+                kept[moved_to] = card
+        self.visible = kept
+        self.update_content_height()
+        self.update_viewport()
+
+    def remove_item(self, img_id):
+        """Drops one item in place: later cards shift back a slot and keep their images,
+        and the scroll position is preserved."""
+        index = next((i for i, (item_id, _) in enumerate(self.items) if item_id == img_id), None)
+        if index is None:
+            return
+        del self.items[index]
+        self.current_data.pop(img_id, None)
+        if not self.items:
+            self.refresh_grid()
+            return
+        if index in self.visible:
+            self.recycle(index)
+        self.visible = {i - 1 if i > index else i: card for i, card in self.visible.items()}
+        self.update_content_height()
+        self.update_viewport()
+
     def refresh_grid(self):
         # Reset scroll to top
         try:
             self._parent_canvas.yview_moveto(0)
         except Exception:
             pass
-            
-        # Hide currently active cards without destroying them
-        for card in self.pool[:self.active_cards]:
-            card.grid_forget()
-            
+
+        # Recycle currently bound cards without destroying them
+        self.release_all()
+        self.items = list(self.current_data.items())
+
         if self.no_data_lbl and self.no_data_lbl.winfo_exists():
             self.no_data_lbl.grid_forget()
-        
+
         # If no data
-        if not self.current_data:
+        if not self.items:
+            self.spacer.grid_forget()
             if not self.no_data_lbl or not self.no_data_lbl.winfo_exists():
                 self.no_data_lbl = ctk.CTkLabel(self, text="这里没有找到任何图片哦~", font=ctk.CTkFont(size=14))
-            self.no_data_lbl.grid(row=0, column=0, columnspan=self.columns, pady=50)
-            self.active_cards = 0
+            self.no_data_lbl.grid(row=0, column=0, pady=50)
             return
 
-        self.active_cards = len(self.current_data)
-        
-        # Ensure our object pool has enough cards
-        while len(self.pool) < self.active_cards:
-            card = ImageCard(
-                self, "", "", False, 
-                self.data_manager, self.on_card_favorite_toggled
-            )
-            self.pool.append(card)
-
-        # Repopulate map with new data
-        row = 0
-        col = 0
-        for i, (img_id, desc) in enumerate(self.current_data.items()):
-            is_fav = self.data_manager.is_favorite(img_id)
-            card = self.pool[i]
-            # Update existing widget data instead of recreating
-            card.update_data(img_id, desc, is_fav)
-            card.grid(row=row, column=col, padx=10, pady=10)
-            
-            col += 1
-            if col >= self.columns:
-                col = 0
-                row += 1
+        self.update_content_height()
+        self.update_viewport()
+
+    def release_all(self):
+        for index in list(self.visible):
+            self.recycle(index)
+
+    def recycle(self, index):
+        """Unbinds the card shown for item `index` and returns it to the pool."""
+        card = self.visible.pop(index)
+        card.place_forget()
+        card.cancel_loading()
+        self.placements.pop(card, None)
+        self.pending_moves.pop(card, None)
+        self.pool.append(card)
+
+    def update_content_height(self):
+        height = self._apply_widget_scaling(content_height(len(self.items), self.columns))
+        self.spacer.configure(height=height)
+        self.spacer.grid(row=0, column=0, sticky="nw")
+
+    def viewport(self):
+        """Returns (top, height, width) of the visible area in logical pixels."""
+        scaling = self._get_widget_scaling()
+        canvas = self._parent_canvas
+        top = canvas.canvasy(0) / scaling
+        return top, canvas.winfo_height() / scaling, canvas.winfo_width() / scaling
+
+    def update_viewport(self):
+        """Binds cards to the items in the visible window, recycles the rest and queues the
+        cards whose cell changed for the next move batch."""
+        if not self.items:
+            return
+        top, height, width = self.viewport()
+        start, end = visible_range(top, height, len(self.items), self.columns)
+
+        # Recycle cards that scrolled out of the window
+        for index in [i for i in self.visible if i < start or i >= end]:
+            self.recycle(index)
+
+        for index in range(start, end):
+            # On-screen cards load first, then overscan rows by distance
+            priority = row_distance(index, self.columns, top, height)
+            card = self.visible.get(index)
+            if card is None:
+                card = self.pool.pop() if self.pool else ImageCard(
+                    self, "", "", False,
+                    self.data_manager, self.on_card_favorite_toggled,
+                    on_find_similar=self.on_find_similar, on_hover=self.on_card_hover
+                )
+                img_id, desc = self.items[index]
+                card.update_data(img_id, desc, self.data_manager.is_favorite(img_id), priority)
+                self.visible[index] = card
+            else:
+                card.set_priority(priority)
+            self.move_card(card, *cell_position(index, self.columns, width))
+
+    def move_card(self, card, x, y):
+        if self.placements.get(card) == (x, y):
+            self.pending_moves.pop(card, None)
+            return
+        self.pending_moves[card] = (x, y)
+        if self.move_job is None:
+            self.move_job = self.after_idle(self.apply_moves)
+
+    def apply_moves(self):
+        """Places queued cards until the time slice runs out, then yields to the event loop."""
+        self.move_job = None
+        deadline = time.perf_counter() + MOVE_BATCH_MS / 1000
+        while self.pending_moves:
+            card = next(iter(self.pending_moves))
+            x, y = self.pending_moves.pop(card)
+            card.place(x=x, y=y)
+            self.placements[card] = (x, y)
+            if time.perf_counter() > deadline:
+                break
+        if self.pending_moves:
+            self.move_job = self.after_idle(self.apply_moves)
+
+    def on_card_hover(self, card):
+        """Speculatively prepares hover previews for the cards around the hovered one."""
+        index = next((i for i, c in self.visible.items() if c is card), None)
+        if index is None:
+            return
+        neighbours = (index - 1, index + 1, index - self.columns, index + self.columns)
+        HoverPreview.prefetch([self.visible[i].img_path for i in neighbours if i in self.visible])
+
+    def on_scroll(self, first, last):
+        self._scrollbar.set(first, last)
+        self.update_viewport()
 
     def on_card_favorite_toggled(self, img_id, is_fav):
         """Callback when an image's favorite status is toggled."""
         if self.showing_favorites and not is_fav:
             # If removing from favorites while viewing favorites, remove the card visually
-            self.refresh_grid()
+            self.remove_item(img_id)
 
     def on_resize(self, event):
-        """Responsive grid calculation."""
-        # 140 widget width + 20 padding
-        new_cols = max(1, event.width // 160)
-        if new_cols != self.columns and new_cols > 0:
-            self.columns = new_cols
-            self.repack_cards()
+        """Responsive grid calculation; a burst of drag events is coalesced into one relayout."""
+        if event.width == self.last_width:
+            return
+        self.last_width = event.width
+        if self.resize_job is None:
+            self.resize_job = self.after_idle(self.repack_cards)
 
     def repack_cards(self):
-        """Regrid cards when resizing."""
-        row = 0
-        col = 0
-        for i in range(self.active_cards):
-            card = self.pool[i]
-            card.grid_forget()
-            card.grid(row=row, column=col, padx=10, pady=10)
-            col += 1
-            if col >= self.columns:
-                col = 0
-                row += 1
+        """Relayout for the latest width; only cards whose cell moved are re-placed."""
+        self.resize_job = None
+        new_cols = compute_columns(self.last_width / self._get_widget_scaling())
+        columns_changed = new_cols != self.columns
+        self.columns = new_cols
+        if not self.items:
+            return
+        if columns_changed:
+            self.update_content_height()
+        # Column slots are centred, so any width change moves the visible cards
+        self.update_viewport()
@@ -0,0 +1,42 @@
+import time
+from metrics import METRICS
+
+# The probe re-arms itself every PROBE_INTERVAL_MS; a tick later than STALL_MS counts as a
+# stall and one later than REPORT_MS is also printed
+PROBE_INTERVAL_MS = 100
+STALL_MS = 50
+REPORT_MS = 250
+
+
+class LagProbe:
+    """Measures Tk event-loop lag: how late a periodic after() callback actually runs.
+
+    Anything that blocks the Tk thread (a slow callback, a synchronous decode) delays the
+    tick by the same amount, so late ticks point at UI-thread work rather than I/O.
+    """
+
+    def __init__(self, widget, interval_ms=PROBE_INTERVAL_MS, stall_ms=STALL_MS, report_ms=REPORT_MS):
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.stall_ms = stall_ms
+        self.report_ms = report_ms
+        self.due = 0.0
+        self.job = None
+
+    def start(self):
+        self.due = time.perf_counter() + self.interval_ms / 1000
+        self.job = self.widget.after(self.interval_ms, self.tick)
+
+    def stop(self):
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+            self.job = None
+
+    def tick(self):
+        lag = max(0.0, (time.perf_counter() - self.due) * 1000)
+        METRICS.observe("ui.lag_ms", lag)
+        if lag > self.stall_ms:
+            METRICS.incr("ui.stalls")
+            if lag > self.report_ms:
+                print(f"UI thread stalled: after() callback ran {lag:.0f} ms late")
+        self.start()
@@ -0,0 +1,79 @@
+import heapq
+import itertools
+import threading
+
+
+class LoadJob:
+    __slots__ = ("owner", "fn", "args", "priority", "cancelled")
+
+    def __init__(self, owner, fn, args, priority):
+        self.owner = owner
+        self.fn = fn
+        self.args = args
+        self.priority = priority
+        self.cancelled = False
+
+
+class LoadScheduler:
+    """Priority work queue for card image loads.
+
+    Each owner (a card) has at most one pending job: submitting again, cancelling or
+    reprioritizing replaces the previous entry. Lower priority values run first, so the
+    grid can hand out 0 for the viewport and the row distance for overscan cards.
+    """
+
+    def __init__(self, workers):
+        self.cond = threading.Condition()
+        self.heap = []
+        self.jobs = {}  # owner -> its pending LoadJob
+        self.seq = itertools.count()  # FIFO tie-break within a priority
+        for i in range(workers):
+            threading.Thread(target=self.worker, name=f"image-loader-{i}", daemon=True).start()
+
+    def submit(self, owner, fn, *args, priority=0):
+        """Queues fn(*args) for `owner`, replacing any job it still has pending."""
+        job = LoadJob(owner, fn, args, priority)
+        with self.cond:
+            old = self.jobs.get(owner)
+            if old is not None:
+                old.cancelled = True
+            self.jobs[owner] = job
+            heapq.heappush(self.heap, (priority, next(self.seq), job))
+            self.cond.notify()
+
+    def reprioritize(self, owner, priority):
+        """Moves the owner's pending job to a new priority; no-op if it already started."""
+        with self.cond:
+            old = self.jobs.get(owner)
+            if old is None or old.priority == priority:
+                return
+            old.cancelled = True
+            job = LoadJob(owner, old.fn, old.args, priority)
+            self.jobs[owner] = job
+            heapq.heappush(self.heap, (priority, next(self.seq), job))
+
+    def cancel(self, owner):
+        with self.cond:
+            job = self.jobs.pop(owner, None)
+            if job is not None:
+                job.cancelled = True
+
+    def pending(self):
+        """Number of jobs waiting to run."""
+        with self.cond:
+            return len(self.jobs)
+
+    def worker(self):
+        while True:
+            with self.cond:
+                while True:
+                    while not self.heap:
+                        self.cond.wait()
+                    _, _, job = heapq.heappop(self.heap)
+                    if not job.cancelled:
+                        break
+                del self.jobs[job.owner]
+            try:
+                job.fn(*job.args)
+            except Exception as e:
+                print(f"Image load job failed: {e}")
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+from image_bundle import open_image
+from .load_scheduler import LoadScheduler
+
+PREVIEW_SIZE = 360
+MAX_PREVIEWS = 48
+
+# Job priorities: the hovered card first, speculative neighbours after
+HOVER_PRIORITY = 0
+NEIGHBOUR_PRIORITY = 1
+
+
+def render_preview(img_path):
+    from PIL import Image
+    pil_img = open_image(img_path)
+    pil_img.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.LANCZOS)
+    pil_img.load()
+    return pil_img
+
+
+class PreviewCache:
+    """Small LRU of preview-size renders, decoded off the Tk thread."""
+
+    def __init__(self, max_entries=MAX_PREVIEWS, workers=2):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # img_path -> PIL image
+        self.waiters = {}             # img_path -> callbacks to run once it is decoded
+        self.scheduler = LoadScheduler(workers)
+
+    def get(self, img_path):
+        with self.lock:
+            pil_img = self.entries.get(img_path)
+            if pil_img is not None:
+                self.entries.move_to_end(img_path)
+            return pil_img
+
+    def request(self, img_path, callback=None, priority=HOVER_PRIORITY):
+        """Decodes img_path in the background if needed; callback(pil_img) runs on the worker."""
+        with self.lock:
+            pil_img = self.entries.get(img_path)
+            if pil_img is None and callback is not None:
+                self.waiters.setdefault(img_path, []).append(callback)
+        if pil_img is not None:
+            if callback is not None:
+                callback(pil_img)
+            return
+        # Re-submitting replaces a queued job for the same path, so this also reprioritizes
+        self.scheduler.submit(img_path, self._decode, img_path, priority=priority)
+
+    def prefetch(self, img_paths):
+        """Speculatively prepares previews (e.g. for the hovered card's neighbours)."""
+        for img_path in img_paths:
+            if img_path and self.get(img_path) is None:
+                self.scheduler.submit(img_path, self._decode, img_path, priority=NEIGHBOUR_PRIORITY)
+
+    def cancel(self, img_path):
+        """Pointer left before the preview was needed: drop queued work and callbacks."""
+        with self.lock:
+            self.waiters.pop(img_path, None)
+        self.scheduler.cancel(img_path)
+
+    def _decode(self, img_path):
+        if self.get(img_path) is None:
+            try:
+                pil_img = render_preview(img_path)
+            except Exception as e:
+                print(f"Hover preview error: {e}")
+                with self.lock:
+                    self.waiters.pop(img_path, None)
+                return
+            with self.lock:
+                self.entries[img_path] = pil_img
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        with self.lock:
+            pil_img = self.entries.get(img_path)
+            callbacks = self.waiters.pop(img_path, [])
+        for callback in callbacks:
+            callback(pil_img)
@@ -1,18 +1,38 @@
 import customtkinter as ctk
 
 class Sidebar(ctk.CTkFrame):
-    def __init__(self, master, data_manager, on_category_select, **kwargs):
+    def __init__(self, master, data_manager, on_category_select, on_search=None, on_collapse_toggle=None, **kwargs):
         super().__init__(master, width=220, corner_radius=0, **kwargs)
         self.data_manager = data_manager
         self.on_category_select = on_category_select
+        self.on_search = on_search
+        self.clearing_search = False
+        
+        # Search box, results update on every keystroke
+        self.search_var = ctk.StringVar()
+        self.search_entry = ctk.CTkEntry(self, textvariable=self.search_var, placeholder_text="搜索背景描述...")
+        self.search_entry.pack(fill="x", pady=(20, 0), padx=20)
+        self.search_var.trace_add("write", lambda *_: self.search_changed())
+
+        # Colour search: picks a colour and searches for it as "#rrggbb"
+        self.color_btn = ctk.CTkButton(self, text="🎨 按颜色查找", command=self.pick_color)
+        self.color_btn.pack(fill="x", pady=(6, 0), padx=20)
         
         # Title
         self.title_label = ctk.CTkLabel(self, text="分类目录", font=ctk.CTkFont(size=18, weight="bold"))
-        self.title_label.pack(pady=(20, 10), padx=20, anchor="w")
+        self.title_label.pack(pady=(10, 10), padx=20, anchor="w")
         
         # Scrollable area for categories
         self.scroll_frame = ctk.CTkScrollableFrame(self, fg_color="transparent")
         self.scroll_frame.pack(fill="both", expand=True, padx=0)
+
+        # Hide near-duplicate artwork that appears under several categories
+        self.collapse_var = ctk.BooleanVar(value=False)
+        self.collapse_switch = ctk.CTkSwitch(
+            self, text="合并重复图片", variable=self.collapse_var,
+            command=lambda: on_collapse_toggle and on_collapse_toggle(self.collapse_var.get())
+        )
+        self.collapse_switch.pack(pady=(6, 12), padx=20, anchor="w")
         
         # Buttons list
         self.buttons = []
@@ -38,7 +58,7 @@ class Sidebar(ctk.CTkFrame):
         # Add other categories
         for cat_key in categories:
             cat_name = self.data_manager.get_category_name(cat_key)
-            cat_count = len(self.data_manager.data.get(cat_key, {}))
+            cat_count = self.data_manager.get_category_count(cat_key)
             
             btn = ctk.CTkButton(
                 self.scroll_frame, text=f"{cat_name} ({cat_count})", anchor="w", 
@@ -52,10 +72,37 @@ class Sidebar(ctk.CTkFrame):
         if current_category:
             self.highlight_button(current_category)
 
+    def update_categories(self, categories, current_category=None):
+        """Refreshes counts in place; rebuilds the buttons only if the category list changed."""
+        if [key for key, _ in self.buttons[1:]] != list(categories):
+            self.render_categories(categories, current_category)
+            return
+        for key, btn in self.buttons:
+            if key == "favorites":
+                btn.configure(text=f"⭐ 我的收藏 ({len(self.data_manager.favorites)})")
+            else:
+                cat_name = self.data_manager.get_category_name(key)
+                btn.configure(text=f"{cat_name} ({self.data_manager.get_category_count(key)})")
+
     def select(self, category):
+        if self.search_var.get():
+            # Leaving search mode; the category render below replaces the results
+            self.clearing_search = True
+            self.search_var.set("")
+            self.clearing_search = False
         self.highlight_button(category)
         self.on_category_select(category)
 
+    def pick_color(self):
+        from tkinter import colorchooser
+        _, hex_color = colorchooser.askcolor(parent=self, title="选择颜色")
+        if hex_color:
+            self.search_var.set(hex_color)
+
+    def search_changed(self):
+        if self.on_search and not self.clearing_search:
+            self.on_search(self.search_var.get())
+
     def highlight_button(self, category):
         for key, btn in self.buttons:
             if key == category:
@@ -0,0 +1,143 @@
+import zlib
+import threading
+from collections import OrderedDict
+import customtkinter as ctk
+
+# Default budgets; tune per machine with ThumbnailCache.resize()
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+DEFAULT_COMPRESSED_MAX_BYTES = 32 * 1024 * 1024
+
+
+def image_cost(ctk_img):
+    """Rough resident size of a CTkImage: its PIL pixels plus the scaled PhotoImage CTk keeps."""
+    pil_img = ctk_img.cget("light_image")
+    return pil_img.width * pil_img.height * len(pil_img.getbands()) * 2
+
+
+def load_card_thumbnail(data_manager, cache, img_id, thumb_size, display_size):
+    """The card load path without any Tk calls, shared by ImageCard and benchmark.py.
+
+    Returns (ctk_img, source); the source is None on a memory hit, where it isn't looked up.
+    Returns (None, None) if the image can't be fetched; decode errors propagate.
+    """
+    ctk_img = cache.get(img_id)
+    if ctk_img is not None:
+        return ctk_img, None
+    # A cache file path or a BundleEntry; either works for thumbnails and previews
+    source = data_manager.get_image_source(img_id)
+    if not source:
+        return None, None
+    # Persistent thumbnail tier: only decodes the full image the first time
+    square_img = data_manager.get_thumbnail(img_id, thumb_size, source=source)
+    ctk_img = ctk.CTkImage(light_image=square_img, size=(display_size, display_size))
+    cache.put(img_id, ctk_img)
+    return ctk_img, source
+
+
+class ThumbnailCache:
+    """Byte-budgeted LRU of CTkImages with a zlib-compressed second tier for evicted entries."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, compressed_max_bytes=DEFAULT_COMPRESSED_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.compressed_max_bytes = compressed_max_bytes
+        self.lock = threading.Lock()
+
+        self.entries = OrderedDict()     # img_id -> (ctk_img, cost)
+        self.compressed = OrderedDict()  # img_id -> (mode, pixel size, display size, zlib bytes)
+        self.bytes = 0
+        self.compressed_bytes = 0
+
+        self.hits = 0
+        self.compressed_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compressed_evictions = 0
+
+    def __contains__(self, img_id):
+        with self.lock:
+            return img_id in self.entries or img_id in self.compressed
+
+    def get(self, img_id):
+        """Returns the cached CTkImage or None, promoting compressed entries back to the hot tier."""
+        with self.lock:
+            entry = self.entries.get(img_id)
+            if entry is not None:
+                self.entries.move_to_end(img_id)
+                self.hits += 1
+                return entry[0]
+            packed = self.compressed.pop(img_id, None)
+            if packed is None:
+                self.misses += 1
+                return None
+            self.compressed_bytes -= len(packed[3])
+            self.compressed_hits += 1
+
+        from PIL import Image
+        mode, pixel_size, display_size, data = packed
+        pil_img = Image.frombytes(mode, pixel_size, zlib.decompress(data))
+        ctk_img = ctk.CTkImage(light_image=pil_img, size=display_size)
+        self.put(img_id, ctk_img)
+        return ctk_img
+
+    def put(self, img_id, ctk_img):
+        cost = image_cost(ctk_img)
+        with self.lock:
+            old = self.entries.pop(img_id, None)
+            if old is not None:
+                self.bytes -= old[1]
+            packed = self.compressed.pop(img_id, None)
+            if packed is not None:
+                self.compressed_bytes -= len(packed[3])
+            self.entries[img_id] = (ctk_img, cost)
+            self.bytes += cost
+            self.evict()
+
+    def evict(self):
+        """Moves least recently used entries to the compressed tier until within budget."""
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            img_id, (ctk_img, cost) = self.entries.popitem(last=False)
+            self.bytes -= cost
+            self.evictions += 1
+            pil_img = ctk_img.cget("light_image")
+            data = zlib.compress(pil_img.tobytes(), 1)
+            self.compressed[img_id] = (pil_img.mode, pil_img.size, ctk_img.cget("size"), data)
+            self.compressed_bytes += len(data)
+
+        while self.compressed_bytes > self.compressed_max_bytes and self.compressed:
+            _, packed = self.compressed.popitem(last=False)
+            self.compressed_bytes -= len(packed[3])
+            self.compressed_evictions += 1
+
+    def resize(self, max_bytes=None, compressed_max_bytes=None):
+        """Changes the memory budgets, evicting immediately if needed."""
+        with self.lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if compressed_max_bytes is not None:
+                self.compressed_max_bytes = compressed_max_bytes
+            self.evict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.compressed.clear()
+            self.bytes = 0
+            self.compressed_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.compressed_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "compressed_entries": len(self.compressed),
+                "compressed_bytes": self.compressed_bytes,
+                "compressed_max_bytes": self.compressed_max_bytes,
+                "hits": self.hits,
+                "compressed_hits": self.compressed_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "compressed_evictions": self.compressed_evictions,
+                "hit_rate": (self.hits + self.compressed_hits) / lookups if lookups else 0.0,
+            }